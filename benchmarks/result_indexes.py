@@ -0,0 +1,93 @@
+"""
+Shows the query plans of the dashboard and status history queries on a large synthetic dataset.
+
+    $ DJANGO_SETTINGS_MODULE=example.settings python -m benchmarks.result_indexes
+
+The dataset is created within a transaction that is rolled back. The plans are only meaningful on PostgreSQL,
+where the statistics of the tables are updated before running the queries.
+"""
+
+import datetime as dt
+import os
+import random
+import sys
+import timeit
+
+import django
+
+RESULTS = 200_000
+SLUGS = 20
+FAILED_RATIO = 0.05
+HISTORY_PER_RESULT = 3
+BATCH_SIZE = 5000
+RUNS = 10
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "example.settings")
+    django.setup()
+
+    from django.db import connection, transaction  # noqa: PLC0415
+    from django.utils import timezone  # noqa: PLC0415
+
+    from django_datawatch.models import Result, ResultStatusHistory  # noqa: PLC0415
+
+    random.seed(0)
+    now = timezone.now()
+
+    with transaction.atomic():
+        sys.stdout.write(f"creating {RESULTS} results with {HISTORY_PER_RESULT} status changes each\n")
+        create_dataset(Result, ResultStatusHistory, now)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Result._meta.db_table}")
+                cursor.execute(f"ANALYZE {ResultStatusHistory._meta.db_table}")
+
+        result = Result.objects.failed().first()
+        queries = {
+            "failed and unacknowledged results": Result.objects.failed().unacknowledged().order_by("-status")[:100],
+            "results of a check": Result.objects.filter(slug="check.0").order_by("-status")[:100],
+            "latest status of a result": result.status_history.filter(to_status=Result.STATUS.critical).order_by(
+                "-created",
+            )[:1],
+        }
+        for title, queryset in queries.items():
+            seconds = timeit.timeit(lambda queryset=queryset: list(queryset.all()), number=RUNS) / RUNS
+            sys.stdout.write(f"\n{title} ({seconds * 1e3:.2f}ms)\n{queryset.explain()}\n")
+
+        transaction.set_rollback(True)
+
+
+def create_dataset(result_model, history_model, now):
+    statuses = list(result_model.STATUS._db_values)
+    acknowledged_until = now + dt.timedelta(days=1)
+    for start in range(0, RESULTS, BATCH_SIZE):
+        results = []
+        for i in range(start, min(start + BATCH_SIZE, RESULTS)):
+            failed = random.random() < FAILED_RATIO  # noqa: S311
+            acknowledged = failed and random.random() < 0.5  # noqa: PLR2004, S311
+            results.append(
+                result_model(
+                    slug=f"check.{i % SLUGS}",
+                    identifier=str(i),
+                    status=random.choice(statuses[2:] if failed else statuses[:2]),  # noqa: S311
+                    acknowledged_until=acknowledged_until if acknowledged else None,
+                    payload_description=str(i),
+                ),
+            )
+        results = result_model.objects.bulk_create(results)
+        if results[0].pk is None:
+            identifiers = [result.identifier for result in results]
+            results = list(result_model.objects.filter(identifier__in=identifiers))
+
+        history_model.objects.bulk_create(
+            [
+                history_model(result=result, from_status=None, to_status=random.choice(statuses))  # noqa: S311
+                for result in results
+                for _ in range(HISTORY_PER_RESULT)
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Measures the overhead of the post_save receiver of datawatch for a growing number of checks watching the same model.
+
+    $ DJANGO_SETTINGS_MODULE=example.settings python -m benchmarks.trigger_signals
+
+The saves are sent within a transaction that is rolled back, so neither the database nor a backend is used.
+"""
+
+import os
+import sys
+import timeit
+
+import django
+
+SAVES = 1000
+CHECK_COUNTS = (1, 5, 10, 20, 50)
+
+
+def main():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "example.settings")
+    django.setup()
+
+    from django.contrib.auth.models import Group  # noqa: PLC0415
+    from django.db import transaction  # noqa: PLC0415
+    from django.db.models import signals  # noqa: PLC0415
+
+    from django_datawatch.base import BaseCheck  # noqa: PLC0415
+    from django_datawatch.datawatch import datawatch  # noqa: PLC0415
+
+    class GroupCheck(BaseCheck):
+        trigger_update = {"group": Group}  # noqa: RUF012
+
+        def get_identifier(self, payload):
+            return payload.pk
+
+        def get_group_payload(self, instance):
+            return instance
+
+    group = Group(pk=1, name="benchmark")
+    registered = 0
+    sys.stdout.write(f"{'checks':>8} {'per save':>12} {'per save and check':>20}\n")
+    for count in CHECK_COUNTS:
+        while registered < count:
+            datawatch.register(type(f"GroupCheck{registered}", (GroupCheck,), {}))
+            registered += 1
+
+        with transaction.atomic():
+            seconds = timeit.timeit(
+                lambda: signals.post_save.send(sender=Group, instance=group, created=False, raw=False, using="default"),
+                number=SAVES,
+            )
+            transaction.set_rollback(True)
+
+        per_save = seconds / SAVES
+        sys.stdout.write(f"{count:>8} {per_save * 1e6:>10.1f}us {per_save / count * 1e6:>18.1f}us\n")
+
+
+if __name__ == "__main__":
+    main()
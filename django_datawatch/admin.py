@@ -5,6 +5,7 @@ from django_datawatch.models import (
     Result,
     ResultAssignedGroup,
     ResultAssignedUser,
+    ResultStatusCount,
     ResultStatusHistory,
 )
 
@@ -22,7 +23,7 @@ class ResultAssignedUserInline(admin.TabularInline):
 @admin.register(Result)
 class CheckAdmin(admin.ModelAdmin):
     list_display = ("slug", "identifier", "status")
-    readonly_fields = ("created", "modified")
+    readonly_fields = ("created", "modified", "last_checked")
     search_fields = ("slug", "identifier", "payload_description")
     list_filter = ("status", "slug", "assigned_groups")
     inlines = (ResultAssignedGroupInline, ResultAssignedUserInline)
@@ -30,10 +31,16 @@ class CheckAdmin(admin.ModelAdmin):
 
 @admin.register(CheckExecution)
 class CheckExecutionAdmin(admin.ModelAdmin):
-    list_display = ("slug", "last_run")
+    list_display = ("slug", "last_run", "last_completed", "pending_shards", "watermark", "last_full_run")
     search_fields = ("slug",)
 
 
+@admin.register(ResultStatusCount)
+class ResultStatusCountAdmin(admin.ModelAdmin):
+    list_display = ("slug", "status", "amount")
+    list_filter = ("status", "slug")
+
+
 @admin.register(ResultStatusHistory)
 class ResultStatusHistory(admin.ModelAdmin):
     list_display = (
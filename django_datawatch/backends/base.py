@@ -1,9 +1,19 @@
 class BaseBackend:
+    # whether checks are executed in the process that enqueues them
+    runs_in_process = False
+
     def enqueue(self, slug, run_async=True):
         raise NotImplementedError("enqueue not implemented")
 
+    def enqueue_shard(self, slug, shard, run_async=True, queue=None, run_id=None):
+        raise NotImplementedError("enqueue_shard not implemented")
+
     def refresh(self, slug, run_async=True):
         raise NotImplementedError("refresh not implemented")
 
-    def run(self, slug, identifier, run_async=True, user_forced_refresh=False, queue=None):
+    def run(self, slug, identifier, run_async=True, user_forced_refresh=False, queue=None, run_id=None):
         raise NotImplementedError("run not implemented")
+
+    def run_batch(self, slug, identifiers, run_async=True, queue=None, run_id=None):
+        for identifier in identifiers:
+            self.run(slug=slug, identifier=identifier, run_async=run_async, queue=queue, run_id=run_id)
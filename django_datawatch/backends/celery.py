@@ -1,5 +1,11 @@
 from django_datawatch.backends.base import BaseBackend
-from django_datawatch.tasks import django_datawatch_enqueue, django_datawatch_refresh, django_datawatch_run
+from django_datawatch.tasks import (
+    django_datawatch_enqueue,
+    django_datawatch_enqueue_shard,
+    django_datawatch_refresh,
+    django_datawatch_run,
+    django_datawatch_run_batch,
+)
 
 
 class Backend(BaseBackend):
@@ -14,6 +20,16 @@ class Backend(BaseBackend):
         else:
             django_datawatch_enqueue.apply(**kwargs)
 
+    def enqueue_shard(self, slug, shard, run_async=True, queue=None, run_id=None):
+        kwargs = {"kwargs": {"slug": slug, "shard": shard}}
+        if run_id is not None:
+            kwargs["kwargs"]["run_id"] = run_id
+
+        if run_async:
+            django_datawatch_enqueue_shard.apply_async(**kwargs, queue=queue)
+        else:
+            django_datawatch_enqueue_shard.apply(**kwargs, queue=queue)
+
     def refresh(self, slug, run_async=True):
         kwargs = {"kwargs": {"slug": slug}}
         if run_async:
@@ -21,10 +37,22 @@ class Backend(BaseBackend):
         else:
             django_datawatch_refresh.apply(**kwargs)
 
-    def run(self, slug, identifier, run_async=True, user_forced_refresh=False, queue=None):
+    def run(self, slug, identifier, run_async=True, user_forced_refresh=False, queue=None, run_id=None):
         kwargs = {"kwargs": {"slug": slug, "identifier": identifier, "user_forced_refresh": user_forced_refresh}}
+        if run_id is not None:
+            kwargs["kwargs"]["run_id"] = run_id
 
         if run_async:
             django_datawatch_run.apply_async(**kwargs, queue=queue)
         else:
             django_datawatch_run.apply(**kwargs, queue=queue)
+
+    def run_batch(self, slug, identifiers, run_async=True, queue=None, run_id=None):
+        kwargs = {"kwargs": {"slug": slug, "identifiers": list(identifiers)}}
+        if run_id is not None:
+            kwargs["kwargs"]["run_id"] = run_id
+
+        if run_async:
+            django_datawatch_run_batch.apply_async(**kwargs, queue=queue)
+        else:
+            django_datawatch_run_batch.apply(**kwargs, queue=queue)
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import threading
+
+import django
+from django.conf import settings
+from django.db import close_old_connections
+
+from django_datawatch.backends import synchronous
+from django_datawatch.datawatch import chunked
+from django_datawatch.defaults import defaults
+
+
+def _run_batch(args):
+    slug, identifiers = args
+    close_old_connections()
+    try:
+        synchronous.Backend().run_batch(slug=slug, identifiers=identifiers)
+    finally:
+        close_old_connections()
+    return len(identifiers)
+
+
+class Backend(synchronous.Backend):
+    """
+    Executes scheduled runs and refreshes in a pool of worker processes, one chunk of identifiers at a time.
+    Single runs, e.g. triggered by signals or the web view, are executed right away in the calling process.
+    """
+
+    runs_in_process = False
+
+    def _dispatch(self, check, identifiers, run_id=None):
+        # all chunks have been checked when the pool is closed, so the run doesn't need to count them
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"]) or 1
+        # the identifiers are queried by the calling thread, the pool would consume a generator in its task thread
+        # which uses a database connection of its own, outside of the transaction of the caller
+        # the chunks are handed to the pool as they are generated, with a bounded amount of them waiting for a worker
+        # so the identifiers are never loaded at once
+        slots = threading.BoundedSemaphore(2 * self._get_processes())
+        errors = []
+
+        def on_error(error):
+            errors.append(error)
+            slots.release()
+
+        with self._get_pool() as pool:
+            for chunk in chunked(identifiers, batch_size):
+                slots.acquire()
+                # stop handing out chunks after a worker failed
+                if errors:
+                    break
+                pool.apply_async(
+                    _run_batch,
+                    ((check.slug, chunk),),
+                    callback=lambda _: slots.release(),
+                    error_callback=on_error,
+                )
+            # wait for the chunks in flight, the pool is terminated when leaving the context
+            pool.close()
+            pool.join()
+
+        if errors:
+            raise errors[0]
+
+    def _get_processes(self):
+        return getattr(settings, "DJANGO_DATAWATCH_PROCESSES", defaults["PROCESSES"]) or os.cpu_count() or 1
+
+    def _get_pool(self):
+        # workers are spawned as fresh interpreters with their own database connections, django has to be set up
+        # before the tasks are unpickled because that imports this module and with it the models
+        return multiprocessing.get_context("spawn").Pool(processes=self._get_processes(), initializer=django.setup)
@@ -1,42 +1,100 @@
 import logging
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 
 from django_datawatch.backends.base import BaseBackend
-from django_datawatch.datawatch import datawatch
-from django_datawatch.models import Result
+from django_datawatch.datawatch import chunked, datawatch
+from django_datawatch.defaults import defaults
+from django_datawatch.models import CheckExecution, Result
 
 logger = logging.getLogger(__name__)
 
 
 class Backend(BaseBackend):
+    runs_in_process = True
+
     def enqueue(self, slug, run_async=True):
         check = self._get_check_instance(slug)
         if not check:
             return
 
+        # payloads changed after this point are checked by the next run
+        started = timezone.now()
+        since = check.get_watermark()
+
         try:
-            for payload in check.generate():
-                if payload is None:
-                    continue
-                datawatch.get_backend().run(
-                    slug=check.slug,
-                    identifier=check.get_identifier(payload),
-                    queue=check.queue,
-                )
+            shards = check.get_shards()
+            # an unsharded run is a single shard generated right away
+            run_id = CheckExecution.objects.start_run(
+                slug=slug,
+                watermark=started,
+                full_run=since is None,
+                shards=1 if shards is None else len(shards),
+            )
+            if shards is None:
+                self._enqueue(check, since=since, run_id=run_id)
+                CheckExecution.objects.finish_shard(slug=slug, run_id=run_id)
+                return
         except NotImplementedError as e:
             logger.error(e)
+            return
+
+        # there is nothing to check, e.g. in an empty table
+        if not shards:
+            CheckExecution.objects.complete_run(slug=slug)
+            return
+
+        # generate the payloads of every shard separately, e.g. in parallel celery tasks
+        backend = datawatch.get_backend()
+        for shard in shards:
+            backend.enqueue_shard(slug=slug, shard=shard, queue=check.queue, run_id=run_id)
+
+    def enqueue_shard(self, slug, shard, run_async=True, queue=None, run_id=None):
+        check = self._get_check_instance(slug)
+        if not check:
+            return
+
+        # shards enqueued without a run id belong to the run in progress
+        if run_id is None:
+            execution = CheckExecution.objects.filter(slug=slug).first()
+            run_id = execution.pending_watermark.isoformat() if execution and execution.pending_watermark else None
+        else:
+            execution = CheckExecution.objects.filter(slug=slug, pending_watermark=run_id).first()
+            # the following run checks the payloads of the shard again
+            if execution is None:
+                logger.info("skipping shard %s of %s, its run has been superseded by a following run", shard, slug)
+                return
+
+        since = execution.get_since() if check.incremental and execution else None
+        try:
+            self._enqueue(check, shard, since=since, run_id=run_id)
+        except NotImplementedError as e:
+            logger.error(e)
+            return
+
+        # the run is only completed if every shard has been enqueued successfully
+        if CheckExecution.objects.finish_shard(slug=slug, run_id=run_id):
+            logger.info("the run of %s has been completed", slug)
+
+    def _enqueue(self, check, shard=None, since=None, run_id=None):
+        # checks are run in this process, so the generated payloads can be handled right away
+        if datawatch.get_backend().runs_in_process:
+            payloads = check.generate_payloads(shard, since=since)
+            self._handle(check, (payload for payload in payloads if payload is not None))
+            return
+
+        # the run is completed once the dispatched payloads have been checked elsewhere
+        self._dispatch(check, check.generate_identifiers(shard, since=since), run_id=run_id)
 
     def refresh(self, slug, run_async=True):
-        for result in Result.objects.filter(slug=slug):
-            check = self._get_check_instance(result.slug)
-            if not check:
-                continue
-            datawatch.get_backend().run(
-                slug=result.slug,
-                identifier=result.identifier,
-                queue=check.queue,
-            )
+        check = self._get_check_instance(slug)
+        if not check:
+            return
+
+        identifiers = list(Result.objects.filter(slug=slug).values_list("identifier", flat=True))
+        self._dispatch(check, identifiers)
 
     def run(
         self,
@@ -45,6 +103,7 @@ class Backend(BaseBackend):
         run_async=True,
         user_forced_refresh=False,
         queue=None,
+        run_id=None,
     ):
         check = self._get_check_instance(slug)
         if not check:
@@ -57,16 +116,69 @@ class Backend(BaseBackend):
             return
         except ObjectDoesNotExist:
             Result.objects.filter(slug=slug, identifier=identifier).delete()
+        else:
+            # refresh has been forced by a user from the web view
+            if user_forced_refresh:
+                check.user_forced_refresh_hook(payload=payload)
+
+            check.handle(payload)
+
+        if run_id is not None:
+            CheckExecution.objects.finish_payloads(slug=slug, run_id=run_id, amount=1)
+
+    def run_batch(self, slug, identifiers, run_async=True, queue=None, run_id=None):
+        check = self._get_check_instance(slug)
+        if not check:
             return
 
-        # refresh has been forced by a user from the web view
-        if user_forced_refresh:
-            check.user_forced_refresh_hook(payload=payload)
+        try:
+            payloads = check.get_payloads(identifiers)
+        except NotImplementedError as e:
+            logger.error(e)
+            return
+
+        # delete results of payloads which do not exist anymore
+        missing = {str(identifier) for identifier in identifiers} - set(payloads)
+        if missing:
+            Result.objects.filter(slug=slug, identifier__in=missing).delete()
+
+        check.handle_many(payloads.values())
+
+        if run_id is not None:
+            CheckExecution.objects.finish_payloads(slug=slug, run_id=run_id, amount=len(identifiers))
+
+    def _handle(self, check, payloads):
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"])
+
+        # run every payload on its own if batching has been disabled
+        if not batch_size:
+            for payload in payloads:
+                check.handle(payload)
+            return
+
+        for chunk in chunked(payloads, batch_size):
+            check.handle_many(chunk)
+
+    def _dispatch(self, check, identifiers, run_id=None):
+        backend = datawatch.get_backend()
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"])
+
+        # the payloads of a run are counted before they are dispatched, so the run can't be completed before
+        # the last of them has been checked
+        run_kwargs = {"run_id": run_id} if run_id is not None else {}
+
+        # run every identifier on its own if batching has been disabled
+        if not batch_size:
+            for identifier in identifiers:
+                if run_id is not None:
+                    CheckExecution.objects.add_payloads(slug=check.slug, run_id=run_id, amount=1)
+                backend.run(slug=check.slug, identifier=identifier, queue=check.queue, **run_kwargs)
+            return
 
-        check.handle(payload)
+        for chunk in chunked(identifiers, batch_size):
+            if run_id is not None:
+                CheckExecution.objects.add_payloads(slug=check.slug, run_id=run_id, amount=len(chunk))
+            backend.run_batch(slug=check.slug, identifiers=chunk, queue=check.queue, **run_kwargs)
 
     def _get_check_instance(self, slug):
-        check_class = datawatch.get_check_class(slug)
-        if not check_class:
-            return None
-        return check_class()
+        return datawatch.get_check_instance(slug)
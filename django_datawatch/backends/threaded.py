@@ -0,0 +1,119 @@
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from django_datawatch.backends import synchronous
+from django_datawatch.defaults import defaults
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Executes submitted functions in background threads, reading them from a bounded queue.
+    Functions submitted while the queue is full are executed right away in the submitting thread,
+    the remaining functions are executed on shutdown.
+
+    The threads are started on the first submit, using DJANGO_DATAWATCH_THREADS and DJANGO_DATAWATCH_QUEUE_SIZE.
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        self._start()
+        try:
+            self.queue.put_nowait((func, args, kwargs))
+        except queue.Full:
+            # never block the caller, e.g. a request or a worker thread which would wait for itself
+            logger.warning("Queue of the worker threads is full, running %s right away", self._get_name(func))
+            self._call(func, args, kwargs)
+
+    def join(self):
+        """
+        Waits until all submitted functions have been executed
+        """
+        if self.queue is not None:
+            self.queue.join()
+
+    def shutdown(self, timeout=None):
+        with self.lock:
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _start(self):
+        with self.lock:
+            if self.threads:
+                return
+            self.queue = queue.Queue(maxsize=getattr(settings, "DJANGO_DATAWATCH_QUEUE_SIZE", defaults["QUEUE_SIZE"]))
+            for i in range(getattr(settings, "DJANGO_DATAWATCH_THREADS", defaults["THREADS"])):
+                thread = threading.Thread(target=self._work, name=f"django-datawatch-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                func, args, kwargs = item
+                # every thread has its own database connections, which must not outlive their max age
+                close_old_connections()
+                try:
+                    self._call(func, args, kwargs)
+                finally:
+                    close_old_connections()
+            finally:
+                self.queue.task_done()
+
+    def _call(self, func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background run of %s failed", self._get_name(func))
+
+    @staticmethod
+    def _get_name(func):
+        return getattr(func, "__name__", func)
+
+
+worker_pool = WorkerPool()
+# drain the queue before the interpreter exits
+atexit.register(worker_pool.shutdown)
+
+
+class Backend(synchronous.Backend):
+    """
+    Executes asynchronous runs, e.g. triggered by saving a model, in background threads of the current process.
+    Runs with run_async=False and scheduled checks are executed right away like in the synchronous backend.
+    """
+
+    def run(self, slug, identifier, run_async=True, user_forced_refresh=False, queue=None, run_id=None):
+        if not run_async:
+            super().run(slug=slug, identifier=identifier, user_forced_refresh=user_forced_refresh, run_id=run_id)
+            return
+
+        worker_pool.submit(
+            super().run,
+            slug=slug,
+            identifier=identifier,
+            user_forced_refresh=user_forced_refresh,
+            run_id=run_id,
+        )
+
+    def run_batch(self, slug, identifiers, run_async=True, queue=None, run_id=None):
+        if not run_async:
+            super().run_batch(slug=slug, identifiers=identifiers, run_id=run_id)
+            return
+
+        worker_pool.submit(super().run_batch, slug=slug, identifiers=list(identifiers), run_id=run_id)
@@ -1,33 +1,120 @@
+import asyncio
+import copy
+import inspect
 import logging
+from collections import Counter
 from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import ClassVar
 
+from asgiref.sync import async_to_sync
 from django import forms
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models, transaction
+from django.db.models import Max, Min
 from django.utils import timezone
 
-from django_datawatch.datawatch import datawatch, make_model_uid
-from django_datawatch.models import CheckExecution, Result, ResultStatusHistory
+from django_datawatch.datawatch import datawatch
+from django_datawatch.defaults import defaults
+from django_datawatch.models import (
+    CheckExecution,
+    Result,
+    ResultAssignedGroup,
+    ResultAssignedUser,
+    ResultStatusCount,
+    ResultStatusHistory,
+)
+from django_datawatch.querysets import status_counts_enabled
 
 logger = logging.getLogger(__name__)
 
+_result_index = ContextVar("django_datawatch_result_index", default=None)
+_default_configs = {}
 
-@contextmanager
-def track_status_history(slug, identifier, new_status):
-    result = Result.objects.filter(slug=slug, identifier=identifier).only("id", "status").first()
-    current_status = getattr(result, "status", None)
-    yield
-    if current_status != new_status:
-        if result is None:
-            result = Result.objects.only("id").get(slug=slug, identifier=identifier)
-        ResultStatusHistory.objects.create(from_status=current_status, to_status=new_status, result_id=result.id)
+
+class StatusHistoryWriter:
+    """
+    Buffers status transitions of results and writes them with bulk inserts.
+
+    Flush the writer in the transaction that saves the results, so history rows are only stored together with
+    the status they describe. Primary keys are resolved on flush, which allows adding results before they are created.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size
+        self.transitions = []
+
+    def __len__(self):
+        return len(self.transitions)
+
+    def add(self, result, from_status, to_status):
+        if from_status != to_status:
+            self.transitions.append((result, from_status, to_status))
+
+    def flush(self):
+        transitions, self.transitions = self.transitions, []
+        ResultStatusHistory.objects.bulk_create(
+            [
+                ResultStatusHistory(result_id=result.pk, from_status=from_status, to_status=to_status)
+                for result, from_status, to_status in transitions
+            ],
+            batch_size=self.batch_size,
+        )
+
+
+def _keyset_chunks(queryset, chunk_size, get_pk):
+    """
+    Yields lists of at most `chunk_size` rows of the queryset ordered by primary key.
+    Every chunk is fetched with its own query filtering on the last primary key of the previous chunk,
+    so neither the queryset result cache nor a server side cursor is kept open during the iteration.
+    """
+    queryset = queryset.order_by("pk")
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        chunk = list(queryset.filter(pk__gt=get_pk(chunk[-1]))[:chunk_size])
 
 
 class DatawatchCheckSkipError(Exception):
     pass
 
 
+class ResultIndex:
+    """
+    In-memory index of the existing results of a check, mapped by identifier.
+
+    Identifiers that have been looked up but have no result yet are remembered as well,
+    so a miss doesn't have to be confirmed by another query.
+    """
+
+    def __init__(self, slug, identifiers, results):
+        self.slug = slug
+        self._identifiers = {str(identifier) for identifier in identifiers}
+        self._results = {result.identifier: result for result in results}
+
+    @classmethod
+    def load(cls, slug, identifiers):
+        identifiers = {str(identifier) for identifier in identifiers}
+        return cls(slug, identifiers, Result.objects.filter(slug=slug, identifier__in=identifiers))
+
+    def covers(self, identifiers):
+        return self._identifiers.issuperset(str(identifier) for identifier in identifiers)
+
+    def get(self, identifier):
+        return self._results.get(str(identifier))
+
+    def add(self, result):
+        self._identifiers.add(result.identifier)
+        self._results[result.identifier] = result
+
+    def remove(self, identifier):
+        return self._results.pop(str(identifier), None)
+
+
 class BaseCheckForm(forms.Form):
     def save(self, instance):
         instance.config = self.cleaned_data
@@ -65,6 +152,18 @@ class BaseCheck:
 
     Optionally, you can implements `.get_assigned_users(self, payload)` (resp. `.get_assigned_groups(self, payload)`)
     to define to which user(s) (resp. group(s)) the system had to assign the check result.
+
+    A single instance of every check is shared within a process, so checks must not keep state on the instance.
+    Set `cache_instance = False` to get a new instance every time the check is used instead.
+
+    `.check(self, payload)` and `.generate(self)` may also be implemented as `async def`, a batch of payloads is
+    then checked concurrently with at most `check_concurrency` checks running at the same time.
+
+    Set `shards` to split the generation of payloads into that many parts, which are enqueued separately.
+    `.generate(self, shard)` then receives one of the shards returned by `.get_shards(self)`.
+
+    Set `incremental = True` to only check payloads that changed since the last completed run,
+    `.generate(self, since)` then receives the start of that run, or None every `full_run_every` to check all payloads.
     """
 
     config_form: BaseCheckForm | None = None
@@ -72,8 +171,16 @@ class BaseCheck:
     max_acknowledge: int | None = None
     run_every = None
     trigger_update: ClassVar[dict[str, models.Model]] = {}
+    trigger_update_fields: ClassVar[dict[str, list[str]]] = {}
     model_class: models.Model | None = None
     queue: str | None = None
+    cache_instance = True
+    iterate_chunk_size = 2000
+    check_concurrency = 10
+    shards: int | None = None
+    incremental = False
+    modified_field = "modified"
+    full_run_every = None
 
     def __init__(self):
         self.slug = datawatch.get_slug(self.__module__, self.__class__.__name__)
@@ -92,38 +199,114 @@ class BaseCheck:
         datawatch.get_backend().refresh(slug=self.slug)
 
     def handle(self, payload):
-        # get old result
-        old_status = None
-        result = Result.objects.filter(slug=self.slug, identifier=self.get_identifier(payload)).first()
-        if result:
-            old_status = result.status
+        self.handle_many([payload])
 
-        # run check
-        try:
-            response = self.check(payload)
-        except DatawatchCheckSkipError:
-            if result:
-                result.delete()
+    def handle_many(self, payloads):
+        """
+        run the check for a batch of payloads and persist the results with a
+        constant number of queries, independent of the amount of payloads
+        """
+        payloads = [payload for payload in payloads if payload is not None]
+        identifiers = [str(self.get_identifier(payload)) for payload in payloads]
+
+        with self.preload_results(identifiers) as index:
+            # run checks
+            skipped, items = [], {}
+            for payload, identifier, response in zip(payloads, identifiers, self.check_many(payloads), strict=True):
+                if isinstance(response, DatawatchCheckSkipError):
+                    items.pop(identifier, None)
+                    skipped.append(identifier)
+                    continue
+
+                status = response.get_status()
+                old_status = getattr(index.get(identifier), "status", None)
+                unacknowledge = (
+                    old_status in [Result.STATUS.warning, Result.STATUS.critical] and status == Result.STATUS.ok
+                )
+                items[identifier] = (payload, status, response.get_data(), unacknowledge)
+
+            # save check results
+            with transaction.atomic():
+                skipped_ids = [result.pk for result in map(index.remove, skipped) if result is not None]
+                if skipped_ids:
+                    Result.objects.filter(pk__in=skipped_ids).delete()
+                return self.save_many(items.values())
+
+    def check_many(self, payloads):
+        """
+        :return: list with the response of `.check()` for every payload, or the raised DatawatchCheckSkipError
+        """
+        if inspect.iscoroutinefunction(self.check):
+            return async_to_sync(self._check_concurrently)(payloads)
+
+        responses = []
+        for payload in payloads:
+            try:
+                responses.append(self.check(payload))
+            except DatawatchCheckSkipError as e:
+                responses.append(e)
+        return responses
+
+    async def _check_concurrently(self, payloads):
+        semaphore = asyncio.Semaphore(self.check_concurrency)
+
+        async def check(payload):
+            async with semaphore:
+                try:
+                    return await self.check(payload)
+                except DatawatchCheckSkipError as e:
+                    return e
+
+        return await asyncio.gather(*(check(payload) for payload in payloads))
+
+    @contextmanager
+    def preload_results(self, identifiers):
+        """
+        Makes the existing results for the given identifiers available to all stages of a run,
+        e.g. .get_result(), .get_config() and .save_many(), without querying them one by one.
+
+        An already active index is reused if it contains all of the identifiers.
+        """
+        index = _result_index.get()
+        if index is not None and index.slug == self.slug and index.covers(identifiers):
+            yield index
             return
 
-        # save check result
-        status = response.get_status()
-        unacknowledge = old_status in [Result.STATUS.warning, Result.STATUS.critical] and status == Result.STATUS.ok
-        self.save(payload=payload, status=status, data=response.get_data(), unacknowledge=unacknowledge)
+        token = _result_index.set(ResultIndex.load(self.slug, identifiers))
+        try:
+            yield _result_index.get()
+        finally:
+            _result_index.reset(token)
+
+    def get_result(self, identifier):
+        """
+        :return: the existing result for the identifier, taken from the preloaded results if available
+        """
+        index = _result_index.get()
+        if index is not None and index.slug == self.slug and index.covers([identifier]):
+            return index.get(identifier)
+        return Result.objects.filter(slug=self.slug, identifier=identifier).first()
 
     def get_config(self, payload):
-        try:
-            check_result = Result.objects.get(slug=self.slug, identifier=self.get_identifier(payload))
+        config = self.get_default_config()
 
-            # check has a configuration
-            if check_result.config:
-                return check_result.config
-        except Result.DoesNotExist:
-            pass
+        # check has a configuration
+        check_result = self.get_result(self.get_identifier(payload))
+        if check_result and check_result.config:
+            config.update(check_result.config)
+        return config
 
-        # get default config from form initial values
-        form = self.get_form_class()()
-        return {name: field.initial for name, field in form.fields.items()}
+    def get_default_config(self):
+        """
+        get default config from form initial values, the form is only built once per check class
+        """
+        check_class = type(self)
+        if check_class not in _default_configs:
+            form_class = self.get_form_class()
+            fields = form_class().fields if form_class else {}
+            _default_configs[check_class] = {name: field.initial for name, field in fields.items()}
+        # the initial values may be mutable, e.g. lists of a multiple choice field
+        return copy.deepcopy(_default_configs[check_class])
 
     def get_form(self, payload):
         return self.get_form_class()(**self.get_config(payload))
@@ -132,44 +315,323 @@ class BaseCheck:
         return self.config_form
 
     def save(self, payload, status, data=None, unacknowledge=False):
-        # build default data
-        defaults = {"status": status, "data": data, "payload_description": self.get_payload_description(payload)}
-
-        if unacknowledge:
-            defaults.update({"acknowledged_by": None, "acknowledged_at": None, "acknowledged_until": None})
-
-        with transaction.atomic(), track_status_history(self.slug, self.get_identifier(payload), status):
-            # save the check
-            dataset, _created = Result.objects.update_or_create(
-                slug=self.slug,
-                identifier=self.get_identifier(payload),
-                defaults=defaults,
-            )
+        return self.save_many([(payload, status, data, unacknowledge)])[0]
 
-            # set assigned users and groups
-            if groups := self.get_assigned_groups(payload, status):
-                dataset.assigned_groups.set(groups)
+    def save_many(self, items):
+        """
+        :param items: iterable of (payload, status, data, unacknowledge) tuples
+        :return: list of saved results in the order of the given items
+        """
+        items = list(items)
+        identifiers = [str(self.get_identifier(payload)) for payload, *_ in items]
+        index = _result_index.get()
+        if Result.objects.supports_upsert() and (
+            index is None or index.slug != self.slug or not index.covers(identifiers)
+        ):
+            # the upsert returns the previous status itself, no need to read the existing results up front
+            return self._save_many(items, identifiers, index=None)
+        with self.preload_results(identifiers) as index:
+            return self._save_many(items, identifiers, index)
+
+    def _save_many(self, items, identifiers, index):
+        now = timezone.now()
+        results, created, updated, unchanged = [], [], [], []
+        upsert = Result.objects.supports_upsert()
+        history = StatusHistoryWriter(
+            batch_size=getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"]),
+        )
+        unacknowledged = set()
+        counts = Counter()
+        for (payload, status, data, unacknowledge), identifier in zip(items, identifiers, strict=True):
+            result = index.get(identifier) if index is not None else None
+            payload_description = self.get_payload_description(payload)
+            if result is None:
+                result = Result(slug=self.slug, identifier=identifier, created=now)
+                current_status = None
+                created.append(result)
+            elif not unacknowledge and result.is_unchanged(status, data, payload_description):
+                # skip writing results that did not change, only mark them as checked
+                result.last_checked = now
+                unchanged.append(result)
+                results.append(result)
+                continue
             else:
-                dataset.assigned_groups.clear()
-
-            if users := self.get_assigned_users(payload, status):
-                dataset.assigned_users.set(users)
+                current_status = result.status
+                updated.append(result)
+
+            result.status = status
+            result.data = data
+            result.payload_description = payload_description
+            result.modified = now
+            result.last_checked = now
+            if unacknowledge:
+                result.acknowledged_by = None
+                result.acknowledged_at = None
+                result.acknowledged_until = None
+                unacknowledged.add(identifier)
+
+            results.append(result)
+            if not upsert:
+                history.add(result, current_status, status)
+
+        with transaction.atomic():
+            # save the checks
+            if upsert:
+                results, existing = self._upsert(results, unchanged, unacknowledged, history, counts)
             else:
-                dataset.assigned_users.clear()
+                self._bulk_write(created, updated, unacknowledged, counts)
+                existing = [result.pk for result in updated + unchanged]
+            if unchanged:
+                Result.objects.filter(pk__in=[result.pk for result in unchanged]).update(last_checked=now)
+            for result in results if index is not None else ():
+                index.add(result)
+
+            # track status changes
+            history.flush()
+            if status_counts_enabled():
+                ResultStatusCount.objects.apply(counts)
 
-        return dataset
+            # set assigned users and groups
+            self._save_assignments(items, results, existing=existing)
+
+        return results
+
+    def _bulk_write(self, created, updated, unacknowledged, counts):
+        if created:
+            Result.objects.bulk_create(created)
+            self._fetch_missing_pks(created)
+            for result in created:
+                counts[result.get_count_key()] += 1
+        if updated:
+            # the locked rows are moved from the counts of their stored status, even if it has been changed since
+            # the results were loaded, results deleted in the meantime are not written
+            stored = Result.objects.select_for_update().filter(pk__in=[result.pk for result in updated])
+            stored = dict(stored.values_list("pk", "status"))
+            for result in updated:
+                if result.pk in stored:
+                    counts[Result.make_count_key(result.slug, stored[result.pk])] -= 1
+                    counts[result.get_count_key()] += 1
+
+            # the acknowledgements are only reset for the unacknowledged results, the preloaded acknowledgements
+            # of the others may be outdated, e.g. acknowledged by a user while the chunk is being checked
+            fields = ["status", "data", "payload_description", "modified", "last_checked"]
+            acknowledgement_fields = ["acknowledged_by", "acknowledged_at", "acknowledged_until"]
+            batches = {}
+            for result in updated:
+                batches.setdefault(result.identifier in unacknowledged, []).append(result)
+            for unacknowledge, batch in batches.items():
+                Result.objects.bulk_update(batch, fields=fields + acknowledgement_fields if unacknowledge else fields)
+
+    def _upsert(self, results, unchanged, unacknowledged, history, counts):
+        """
+        Writes all changed results with one statement per acknowledgement mode and derives the status transitions,
+        the changes of the status counts and the already existing results from the previous state returned by
+        the database.
+        """
+        skip = {id(result) for result in unchanged}
+        pending = {}
+        for result in results:
+            if id(result) not in skip:
+                pending.setdefault(result.identifier in unacknowledged, {})[result.identifier] = result
+
+        saved = {}
+        for unacknowledge, rows in pending.items():
+            for result in Result.objects.upsert(list(rows.values()), unacknowledge=unacknowledge):
+                saved[result.identifier] = result
+
+        existing = [result.pk for result in unchanged]
+        for result in saved.values():
+            if result.previous_status is not None:
+                existing.append(result.pk)
+                counts[Result.make_count_key(result.slug, result.previous_status)] -= 1
+            counts[result.get_count_key()] += 1
+            history.add(result, result.previous_status, result.status)
+        return [result if id(result) in skip else saved[result.identifier] for result in results], existing
+
+    def _fetch_missing_pks(self, results):
+        # not every database backend returns primary keys from bulk inserts
+        missing = {result.identifier: result for result in results if result.pk is None}
+        if not missing:
+            return
+        for identifier, pk in Result.objects.filter(slug=self.slug, identifier__in=missing).values_list(
+            "identifier",
+            "pk",
+        ):
+            missing[identifier].pk = pk
+
+    def _save_assignments(self, items, results, existing):
+        assigned_groups, assigned_users = set(), set()
+        for (payload, status, *_), result in zip(items, results, strict=True):
+            for group in self.get_assigned_groups(payload, status) or []:
+                assigned_groups.add((result.pk, getattr(group, "pk", group)))
+            for user in self.get_assigned_users(payload, status) or []:
+                assigned_users.add((result.pk, getattr(user, "pk", user)))
+
+        self._sync_assignments(ResultAssignedGroup, "group_id", assigned_groups, existing)
+        self._sync_assignments(ResultAssignedUser, "user_id", assigned_users, existing)
+
+    def _sync_assignments(self, model, field_name, assigned, existing):
+        """
+        Syncs the through table `model` with the set of (result id, related id) pairs in `assigned`,
+        only deleting and creating the rows that changed.
+        """
+        current = {}
+        if existing:
+            current = {
+                (result_id, related_id): pk
+                for pk, result_id, related_id in model.objects.filter(result_id__in=existing).values_list(
+                    "pk",
+                    "result_id",
+                    field_name,
+                )
+            }
+
+        if obsolete := [pk for key, pk in current.items() if key not in assigned]:
+            model.objects.filter(pk__in=obsolete).delete()
+        if missing := assigned - current.keys():
+            model.objects.bulk_create(
+                [model(result_id=result_id, **{field_name: related_id}) for result_id, related_id in missing],
+            )
 
-    def get_trigger_update_uid_map(self):
-        mapping = {}
-        for method_name, model in self.trigger_update.items():
-            mapping[make_model_uid(model)] = f"get_{method_name}_payload"
-        return mapping
+    def get_queryset(self) -> models.QuerySet | None:
+        """
+        return a queryset of payloads to be streamed by the default `.generate()`
+        """
+        return None
 
-    def generate(self):
+    def generate(self, shard=None, since=None):
         """
         yield items to run check for
+
+        :param shard: one of the shards returned by `.get_shards()`, only given if the check is sharded
+        :param since: only yield items changed since then, only given if the check is incremental
+        """
+        queryset = self.get_queryset()
+        if queryset is None:
+            raise NotImplementedError(".generate() must be overridden")
+        yield from self.iterate(self.filter_since(self.filter_shard(queryset, shard), since))
+
+    def get_watermark(self):
+        """
+        :return: the start of the last completed run of an incremental check,
+                 or None if all payloads have to be checked
+        """
+        if not self.incremental:
+            return None
+
+        execution = CheckExecution.objects.filter(slug=self.slug).first()
+        if execution is None or execution.watermark is None:
+            return None
+
+        # run a full check periodically to catch changes that are not reflected by the modified field
+        if self.full_run_every is not None:
+            if execution.last_full_run is None:
+                return None
+            last_full_run = execution.last_full_run.astimezone(timezone.get_current_timezone())
+            if self.full_run_every.is_due(last_run_at=last_full_run).is_due:
+                return None
+        return execution.watermark
+
+    def filter_since(self, queryset, since):
+        """
+        :return: the part of the queryset that has been modified since the given watermark
+        """
+        if since is None:
+            return queryset
+        return queryset.filter(**{f"{self.modified_field}__gte": since})
+
+    def get_shards(self):
+        """
+        :return: list of JSON serializable shards to generate the payloads for separately,
+                 or None if the check is not sharded
+
+        By default the primary key range of `.get_queryset()`, resp. `model_class`, is split into `shards` ranges,
+        which requires an integer primary key.
         """
-        raise NotImplementedError(".generate() must be overridden")
+        if not self.shards:
+            return None
+
+        queryset = self.get_queryset()
+        if queryset is None:
+            if self.model_class is None:
+                raise NotImplementedError(".get_shards() must be overridden")
+            queryset = self.model_class._default_manager.all()
+
+        # ranges of e.g. UUIDs or strings can't be split by the arithmetic below
+        if not isinstance(queryset.model._meta.pk, models.IntegerField):
+            raise NotImplementedError(".get_shards() must be overridden for primary keys that are not integers")
+
+        bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return []
+        size = -(-(bounds["high"] - bounds["low"] + 1) // self.shards)
+        stop = bounds["high"] + 1
+        return [[start, min(start + size, stop)] for start in range(bounds["low"], stop, size)]
+
+    def filter_shard(self, queryset, shard):
+        """
+        :return: the part of the queryset that belongs to a shard returned by the default `.get_shards()`
+        """
+        if shard is None:
+            return queryset
+        start, stop = shard
+        return queryset.filter(pk__gte=start, pk__lt=stop)
+
+    def generate_identifiers(self, shard=None, since=None):
+        """
+        yield the identifiers of the items to run check for, used by backends that fetch payloads themselves
+
+        Only the primary keys are queried if the check uses `.get_queryset()` with the default `.generate()`
+        and `.get_identifier()`.
+        """
+        queryset = self.get_queryset()
+        if (
+            queryset is not None
+            and type(self).generate is BaseCheck.generate
+            and type(self).get_identifier is BaseCheck.get_identifier
+        ):
+            queryset = self.filter_since(self.filter_shard(queryset, shard), since).values_list("pk", flat=True)
+            for chunk in _keyset_chunks(queryset, self.iterate_chunk_size, lambda pk: pk):
+                yield from chunk
+            return
+
+        for payload in self.generate_payloads(shard, since=since):
+            if payload is not None:
+                yield self.get_identifier(payload)
+
+    def generate_payloads(self, shard=None, since=None):
+        """
+        yield the items of `.generate()`, which may also be an async generator
+        """
+        # checks that are neither sharded nor incremental may implement .generate() without arguments
+        kwargs = {}
+        if shard is not None:
+            kwargs["shard"] = shard
+        if self.incremental:
+            kwargs["since"] = since
+        generator = self.generate(**kwargs)
+        if not inspect.isasyncgen(generator):
+            yield from generator
+            return
+
+        # keep a single event loop for the whole generator, it may hold resources bound to the loop
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(anext(generator))
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(generator.aclose())
+            loop.close()
+
+    def iterate(self, queryset, chunk_size=None):
+        """
+        yield all objects of the queryset ordered by primary key, holding only one chunk of them in memory
+        """
+        for chunk in _keyset_chunks(queryset, chunk_size or self.iterate_chunk_size, lambda obj: obj.pk):
+            yield from chunk
 
     def check(self, payload):
         """
@@ -184,6 +646,23 @@ class BaseCheck:
     def get_payload(self, identifier):
         return self.model_class.objects.get(pk=identifier)
 
+    def get_payloads(self, identifiers):
+        """
+        :param identifiers: list of identifiers to fetch the payloads for
+        :return: dict of payloads mapped by their identifier, identifiers without payload are left out
+        """
+        # fetch model based payloads with a single query if .get_payload has not been customized
+        if self.model_class is not None and type(self).get_payload is BaseCheck.get_payload:
+            return {str(pk): payload for pk, payload in self.model_class.objects.in_bulk(identifiers).items()}
+
+        payloads = {}
+        for identifier in identifiers:
+            try:
+                payloads[str(identifier)] = self.get_payload(identifier)
+            except ObjectDoesNotExist:
+                continue
+        return payloads
+
     def register(self, check_class):
         pass
 
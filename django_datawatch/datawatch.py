@@ -1,6 +1,11 @@
+import copy
 import importlib
+import itertools
 import logging
+import threading
+import weakref
 from collections.abc import Iterable
+from contextlib import contextmanager
 
 from celery.schedules import crontab
 from django.conf import settings
@@ -17,7 +22,11 @@ logger = logging.getLogger(__name__)
 class DatawatchHandler:
     def __init__(self):
         self._registered_checks = {}
-        self._related_models = {}
+        self._check_instances = {}
+        self._model_checks = {}
+        self._trigger_table = {}
+        self._tracked_fields = {}
+        self._deferred = threading.local()
         self._backend = None
 
     def autodiscover_checks(self, module_name="checks"):
@@ -26,14 +35,24 @@ class DatawatchHandler:
     def register(self, check_class):
         slug = self.get_slug(check_class.__module__, check_class.__name__)
         self._registered_checks[slug] = check_class
-        check = check_class()
+        self._check_instances.pop(slug, None)
+        check = self.get_check_instance(slug)
 
-        # register delete signal receiver if check is model based
+        # a check registered again may watch other models
+        for model_checks in self._model_checks.values():
+            model_checks.pop(slug, None)
+        for trigger_table in self._trigger_table.values():
+            for key in [key for key in trigger_table if key[0] == slug]:
+                del trigger_table[key]
+
+        # register delete signal receiver if check is model based, a single one per model deletes all results
         if check.model_class is not None:
+            model_uid = make_model_uid(check.model_class)
+            self._model_checks.setdefault(model_uid, {})[slug] = check_class
             signals.post_delete.connect(
                 delete_results,
                 sender=check.model_class,
-                dispatch_uid=f"django_datawatch_{slug}",
+                dispatch_uid=f"django_datawatch_{model_uid}",
             )
 
         # register update
@@ -44,16 +63,21 @@ class DatawatchHandler:
                     logger.warning('Update trigger "%s" defined without .%s()', keyword, method_name)
                     continue
 
-                # listen to updates on all trigger models
+                # a single receiver per trigger model runs all checks of its dispatch table
                 model_uid = make_model_uid(model)
-                datawatch._related_models.setdefault(model_uid, [])
-                if check_class not in datawatch._related_models[model_uid]:
-                    signals.post_save.connect(
-                        run_checks,
+                fields = self.get_trigger_fields(check, keyword, model)
+                self._trigger_table.setdefault(model_uid, {})[slug, method_name] = (check_class, fields)
+                signals.post_save.connect(run_checks, sender=model, dispatch_uid=f"django_datawatch_{model_uid}")
+
+                # remember the initial values of the fields the check depends on to detect changes on save
+                if fields is not None:
+                    tracked_fields = self._tracked_fields.setdefault(model_uid, {})
+                    tracked_fields.update((model._meta.get_field(name).attname, name) for name in fields)
+                    signals.post_init.connect(
+                        track_fields,
                         sender=model,
-                        dispatch_uid=f"django_datawatch_{slug}_{keyword}",
+                        dispatch_uid=f"django_datawatch_{model_uid}",
                     )
-                    datawatch._related_models[model_uid].append(check_class)
 
         return check_class
 
@@ -68,18 +92,40 @@ class DatawatchHandler:
             return self._registered_checks[slug]
         return None
 
+    def get_check_instance(self, slug):
+        check_class = self.get_check_class(slug)
+        if check_class is None:
+            return None
+        return self.get_check_instance_for_class(check_class)
+
+    def get_check_instance_for_class(self, check_class):
+        """
+        Returns the shared instance of the given check class, checks opting out
+        by setting `cache_instance = False` are instantiated on every call.
+
+        :param check_class: check class
+        :return: check instance
+        """
+        if not check_class.cache_instance:
+            return check_class()
+
+        slug = self.get_slug(check_class.__module__, check_class.__name__)
+        check = self._check_instances.get(slug)
+        if type(check) is not check_class:
+            check = self._check_instances[slug] = check_class()
+        return check
+
     def get_checks_for_related_model(self, model):
-        model_uid = make_model_uid(model)
-        if model_uid in self._related_models:
-            return self._related_models[model_uid]
-        return None
+        """
+        :return: check classes triggered by saving instances of the model, or None if there are none
+        """
+        trigger_table = self._trigger_table.get(make_model_uid(model))
+        if not trigger_table:
+            return None
+        return list(dict.fromkeys(check_class for check_class, _ in trigger_table.values()))
 
     def get_checks_for_model(self, model):
-        check_classes = []
-        for check_class in datawatch.get_all_registered_checks():
-            if check_class.model_class == model:
-                check_classes.append(check_class)
-        return check_classes
+        return list(self._model_checks.get(make_model_uid(model), {}).values())
 
     def get_slug(self, module, class_name):
         return f"{module}.{class_name}"
@@ -91,47 +137,228 @@ class DatawatchHandler:
         return self._backend
 
     def delete_results(self, sender, instance, db_alias=None):
-        from django_datawatch.models import Result  # noqa: PLC0415
+        """
+        Deletes the results of the instance once the current transaction has been committed,
+        together with the results of all other instances deleted within the transaction.
+        """
+        for check_class in self.get_checks_for_model(model=sender):
+            check = self.get_check_instance_for_class(check_class)
+            self._add_on_commit(
+                "datawatch_pending_deletions",
+                lambda: PendingDeletions(db_alias),
+                db_alias,
+                check.slug,
+                check.get_identifier(instance),
+            )
+
+    def get_trigger_fields(self, check, keyword, model):
+        """
+        :return: the names and attnames of the fields of the trigger model the check depends on,
+                 or None if it depends on all fields
+        """
+        names = check.trigger_update_fields.get(keyword)
+        if names is None:
+            return None
+        fields = [model._meta.get_field(name) for name in names]
+        return frozenset(field.name for field in fields) | frozenset(field.attname for field in fields)
 
-        for check_class in datawatch.get_checks_for_model(model=sender):
-            check = check_class()
-            identifier = check.get_identifier(instance)
-            Result.objects.using(db_alias).filter(slug=check.slug, identifier=identifier).delete()
+    def track_fields(self, sender, instance):
+        """
+        Remembers the current values of the fields checks depend on, to detect changes when the instance is saved
+        """
+        if not getattr(settings, "DJANGO_DATAWATCH_TRACK_CHANGED_FIELDS", defaults["TRACK_CHANGED_FIELDS"]):
+            return
+        tracked_fields = self._tracked_fields.get(make_model_uid(sender))
+        if tracked_fields:
+            values = instance.__dict__
+            # mutable values, e.g. of JSON fields, may be changed in place
+            instance._datawatch_initial = {
+                attname: copy.deepcopy(values[attname]) for attname in tracked_fields if attname in values
+            }
+
+    def get_changed_fields(self, sender, instance, update_fields=None):
+        """
+        :return: names and attnames of the fields changed by a save, or None if they are unknown
+        """
+        if update_fields is not None:
+            fields = [sender._meta.get_field(name) for name in update_fields]
+            return {field.name for field in fields} | {field.attname for field in fields}
 
-    def update_related(self, sender, instance, db_alias=None):
-        checks = datawatch.get_checks_for_related_model(sender) or []
-        for check_class in checks:
-            check = check_class()
-            backend = datawatch.get_backend()
-            model_uid = make_model_uid(instance.__class__)
-            mapping = check.get_trigger_update_uid_map()
+        initial = instance.__dict__.get("_datawatch_initial")
+        if initial is None:
+            return None
+
+        # fields that have not been loaded initially are considered as changed
+        changed = set()
+        for attname, name in self._tracked_fields.get(make_model_uid(sender), {}).items():
+            if attname not in initial or initial[attname] != instance.__dict__.get(attname):
+                changed.update((attname, name))
+        return changed
 
-            if model_uid not in mapping:
-                return
+    def update_related(self, sender, instance, db_alias=None, update_fields=None, created=False):
+        changed_fields = None if created else self.get_changed_fields(sender, instance, update_fields)
+        self.trigger(sender, instance, db_alias=db_alias, changed_fields=changed_fields)
 
-            if not hasattr(check, mapping[model_uid]):
-                return
+        # following saves of the instance are compared to the saved values
+        self.track_fields(sender, instance)
+
+    def trigger_bulk(self, model, pks, db_alias=None):
+        """
+        Runs the checks triggered by the given instances of a model, e.g. after QuerySet.update or bulk_create which
+        don't send post_save signals. The instances are loaded in chunks and their runs are dispatched in batches.
 
-            payloads = getattr(check, mapping[model_uid])(instance)
+        :param model: trigger model class
+        :param pks: primary keys of the changed instances
+        :param db_alias: database the instances are loaded from
+        """
+        if make_model_uid(model) not in self._trigger_table:
+            return
+
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"]) or 500
+        with self.deferred_triggers(db_alias=db_alias):
+            for chunk in chunked(pks, batch_size):
+                for instance in model._default_manager.using(db_alias).filter(pk__in=chunk).iterator():
+                    self.trigger(model, instance, db_alias=db_alias)
+
+    @contextmanager
+    def deferred_triggers(self, db_alias=None):
+        """
+        Collects all runs triggered within the block, e.g. by the saves of an import, and dispatches them once at its
+        end, or when the surrounding transaction has been committed. Runs triggered multiple times are only dispatched
+        once. Nested blocks are dispatched by the outermost one.
+        """
+        if getattr(self._deferred, "runs", None) is not None:
+            yield
+            return
+
+        pending = self._deferred.runs = PendingRuns()
+        try:
+            yield
+        finally:
+            self._deferred.runs = None
+            # changes saved before an error are committed as well unless the surrounding transaction is rolled back
+            if pending:
+                transaction.on_commit(pending.dispatch, using=db_alias)
+
+    def trigger(self, sender, instance, db_alias=None, changed_fields=None):
+        """
+        Schedules the runs of all checks triggered by the instance
+
+        :param changed_fields: names of the changed fields, checks depending on other fields only are skipped
+        """
+        for (_slug, method_name), (check_class, fields) in self._trigger_table.get(make_model_uid(sender), {}).items():
+            # skip checks that do not depend on any of the changed fields
+            if fields is not None and changed_fields is not None and fields.isdisjoint(changed_fields):
+                continue
+
+            check = self.get_check_instance_for_class(check_class)
+            payloads = getattr(check, method_name)(instance)
             if not isinstance(payloads, Iterable):
                 payloads = [payloads]
 
             for payload in payloads:
                 if not payload:
                     continue
+                self.schedule_run(check, check.get_identifier(payload), db_alias=db_alias)
 
-                # work around lambdas binding to the loop scope, see https://rules.sonarsource.com/python/RSPEC-1515
-                identifier = check.get_identifier(payload)
+    def schedule_run(self, check, identifier, db_alias=None):
+        """
+        Runs the check for the identifier once the current transaction has been committed.
+        Runs scheduled multiple times within a transaction are only dispatched once.
+        """
+        deferred = getattr(self._deferred, "runs", None)
+        if deferred is not None:
+            deferred.add(check, identifier)
+            return
 
-                def execute_backend_run(backend=backend, slug=check.slug, identifier=identifier, queue=check.queue):
-                    backend.run(slug=slug, identifier=identifier, run_async=True, queue=queue)
+        self._add_on_commit("datawatch_pending_runs", PendingRuns, db_alias, check, identifier)
 
-                transaction.on_commit(execute_backend_run, using=db_alias)
+    def _add_on_commit(self, name, factory, db_alias, *args):
+        """
+        Adds an item to the pending set with the given name of the current savepoint, which is dispatched once the
+        transaction has been committed. Each savepoint collects its items in a separate set, so the items added
+        within a savepoint that is rolled back are discarded together with the callback of its set.
+        """
+        connection = transaction.get_connection(db_alias)
+        if not connection.in_atomic_block:
+            pending = factory()
+            pending.add(*args)
+            # dispatched right away as there is no transaction
+            transaction.on_commit(pending.dispatch, using=db_alias)
+            return
+
+        # the sets are only referenced by their callbacks, those of rolled back transactions and savepoints vanish
+        # once Django discards the callbacks
+        pending_sets = getattr(connection, name, None)
+        if pending_sets is None:
+            pending_sets = weakref.WeakValueDictionary()
+            setattr(connection, name, pending_sets)
+
+        savepoint = next((sid for sid in reversed(connection.savepoint_ids) if sid is not None), None)
+        pending = pending_sets.get(savepoint)
+        if pending is None:
+            pending = pending_sets[savepoint] = factory()
+            transaction.on_commit(pending.dispatch, using=db_alias)
+        pending.add(*args)
 
 
 datawatch = DatawatchHandler()
 
 
+class PendingRuns:
+    """
+    De-duplicated set of check runs, dispatched in batches per check and queue
+    """
+
+    def __init__(self):
+        self._runs = {}
+
+    def __len__(self):
+        return sum(map(len, self._runs.values()))
+
+    def add(self, check, identifier):
+        # a dict keeps the order of the identifiers
+        self._runs.setdefault((check.slug, check.queue), {})[identifier] = None
+
+    def dispatch(self):
+        runs, self._runs = self._runs, {}
+        backend = datawatch.get_backend()
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"])
+        for (slug, queue), identifiers in runs.items():
+            if len(identifiers) == 1 or not batch_size:
+                for identifier in identifiers:
+                    backend.run(slug=slug, identifier=identifier, run_async=True, queue=queue)
+                continue
+
+            for chunk in chunked(identifiers, batch_size):
+                backend.run_batch(slug=slug, identifiers=chunk, run_async=True, queue=queue)
+
+
+class PendingDeletions:
+    """
+    De-duplicated set of results to delete, deleted in chunks per check
+    """
+
+    def __init__(self, db_alias=None):
+        self.db_alias = db_alias
+        self._identifiers = {}
+
+    def __len__(self):
+        return sum(map(len, self._identifiers.values()))
+
+    def add(self, slug, identifier):
+        self._identifiers.setdefault(slug, set()).add(str(identifier))
+
+    def dispatch(self):
+        from django_datawatch.models import Result  # noqa: PLC0415
+
+        identifiers, self._identifiers = self._identifiers, {}
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"]) or 500
+        for slug, slug_identifiers in identifiers.items():
+            for chunk in chunked(sorted(slug_identifiers), batch_size):
+                Result.objects.using(self.db_alias).filter(slug=slug, identifier__in=chunk).delete()
+
+
 class Scheduler:
     def run_checks(self, force=False, slug=None):
         """
@@ -142,7 +369,7 @@ class Scheduler:
         last_executions = self.get_last_executions()
 
         for check_class in checks:
-            check = check_class()
+            check = datawatch.get_check_instance_for_class(check_class)
 
             # only update a single slug if requested
             if slug and check.slug != slug:
@@ -184,6 +411,19 @@ def make_model_uid(model):
     return f"{model._meta.app_label}.{model.__name__}"
 
 
+def chunked(iterable, size):
+    """
+    Splits the given iterable into lists of at most `size` items.
+
+    :param iterable: any iterable, consumed lazily
+    :param size: maximum length of a chunk
+    :return: generator of lists
+    """
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
 def delete_results(sender, instance, using, **kwargs):
     if not getattr(settings, "DJANGO_DATAWATCH_RUN_SIGNALS", defaults["RUN_SIGNALS"]):
         return
@@ -201,6 +441,10 @@ def run_checks(sender, instance, created, raw, using, **kwargs):
     if not getattr(settings, "DJANGO_DATAWATCH_RUN_SIGNALS", defaults["RUN_SIGNALS"]):
         return
     try:
-        datawatch.update_related(sender, instance, using)
+        datawatch.update_related(sender, instance, using, update_fields=kwargs.get("update_fields"), created=created)
     except Exception as e:
         logger.exception(e)
+
+
+def track_fields(sender, instance, **kwargs):
+    datawatch.track_fields(sender, instance)
@@ -1 +1,11 @@
-defaults = {"BACKEND": "django_datawatch.backends.synchronous", "RUN_SIGNALS": True, "SHOW_ADMIN_DEBUG": True}
+defaults = {
+    "BACKEND": "django_datawatch.backends.synchronous",
+    "RUN_SIGNALS": True,
+    "TRACK_CHANGED_FIELDS": False,
+    "STATUS_COUNTS": False,
+    "SHOW_ADMIN_DEBUG": True,
+    "BATCH_SIZE": 500,
+    "PROCESSES": None,
+    "THREADS": 2,
+    "QUEUE_SIZE": 1000,
+}
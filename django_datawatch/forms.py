@@ -8,7 +8,8 @@ from django.utils.translation import gettext_lazy as _
 from model_utils.choices import Choices
 
 from django_datawatch.datawatch import datawatch
-from django_datawatch.models import Result, ResultAssignedGroup, ResultTag
+from django_datawatch.models import Result, ResultAssignedGroup, ResultStatusCount, ResultTag
+from django_datawatch.querysets import status_counts_enabled
 
 User = get_user_model()
 
@@ -16,7 +17,8 @@ User = get_user_model()
 class ResultFilterForm(forms.Form):
     STATUS_CHOICES = Choices((0, "all", _("All")), (1, "failed", _("Failed")))
     CHECK_CHOICES = [("", _("All"))] + [
-        (obj().slug, obj().get_title()) for obj in datawatch.get_all_registered_checks()
+        (check.slug, check.get_title())
+        for check in map(datawatch.get_check_instance_for_class, datawatch.get_all_registered_checks())
     ]
 
     user = forms.ModelChoiceField(
@@ -60,7 +62,23 @@ class ResultFilterForm(forms.Form):
         if self.cleaned_data["check"]:
             queryset = queryset.filter(slug=self.cleaned_data["check"])
 
-        return queryset.distinct()
+        return queryset
+
+    def get_stats(self, queryset):
+        """
+        :return: amount of the filtered results per status, read from the status counts unless filtered by user
+                 or by failed results, which excludes the acknowledged ones
+        """
+        if not status_counts_enabled() or not self.is_bound or not self.is_valid() or self.cleaned_data["user"]:
+            return queryset.get_stats()
+        if self.cleaned_data["status"] and self.cleaned_data["status"] == self.STATUS_CHOICES.failed:
+            # acknowledgements expire over time, the partial index of the failed results makes counting them cheap
+            return queryset.get_stats()
+
+        counts = ResultStatusCount.objects.all()
+        if self.cleaned_data["check"]:
+            counts = counts.filter(slug=self.cleaned_data["check"])
+        return counts.get_stats()
 
     @staticmethod
     def _get_user_ids_with_results() -> list[int]:
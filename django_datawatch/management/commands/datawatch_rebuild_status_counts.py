@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from django_datawatch.models import ResultStatusCount
+
+
+class Command(BaseCommand):
+    help = "Count the results per check and status again, e.g. after changing results with QuerySet.update."
+
+    def handle(self, *args, **options):
+        counts = ResultStatusCount.objects.rebuild()
+        self.stdout.write(f"Rebuilt {counts} status counts")
@@ -19,10 +19,8 @@ class Command(BaseCommand):
             return
 
         # refresh all
-        checks = datawatch.get_all_registered_checks()
-        for check_class in checks:
-            check = check_class()
-            self.refresh(check.slug)
+        for check_slug in datawatch.get_all_registered_check_slugs():
+            self.refresh(check_slug)
 
     def refresh(self, slug):
         backend = datawatch.get_backend()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datawatch', '0008_alter_result_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='last_checked',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last checked'),
+        ),
+    ]
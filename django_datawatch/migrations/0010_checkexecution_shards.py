@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datawatch', '0009_result_last_checked'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkexecution',
+            name='last_completed',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last completed'),
+        ),
+        migrations.AddField(
+            model_name='checkexecution',
+            name='pending_shards',
+            field=models.PositiveIntegerField(default=0, verbose_name='Pending shards'),
+        ),
+    ]
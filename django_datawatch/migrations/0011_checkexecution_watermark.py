@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datawatch', '0010_checkexecution_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkexecution',
+            name='last_full_run',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last full run'),
+        ),
+        migrations.AddField(
+            model_name='checkexecution',
+            name='pending_full_run',
+            field=models.BooleanField(default=True, verbose_name='Pending full run'),
+        ),
+        migrations.AddField(
+            model_name='checkexecution',
+            name='pending_watermark',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Pending watermark'),
+        ),
+        migrations.AddField(
+            model_name='checkexecution',
+            name='watermark',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Watermark'),
+        ),
+    ]
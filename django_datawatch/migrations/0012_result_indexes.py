@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    Builds the index without blocking writes to the table on PostgreSQL, like
+    django.contrib.postgres.operations.AddIndexConcurrently, other databases
+    build it as usual.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **self._get_options(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **self._get_options(schema_editor))
+
+    def _get_options(self, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return {'concurrently': True}
+        return {}
+
+
+class Migration(migrations.Migration):
+    # indexes can't be created concurrently within a transaction
+    atomic = False
+
+    dependencies = [
+        ('django_datawatch', '0011_checkexecution_watermark'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='result',
+            index=models.Index(condition=models.Q(('status__in', (0, 1)), _negated=True), fields=['-status', 'acknowledged_until'], name='datawatch_result_failed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='result',
+            index=models.Index(fields=['slug', '-status'], name='datawatch_result_slug_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='resultstatushistory',
+            index=models.Index(fields=['result', 'to_status', '-created'], name='datawatch_history_status_idx'),
+        ),
+    ]
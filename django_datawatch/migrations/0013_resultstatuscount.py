@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_results(apps, schema_editor):
+    # the counts are rebuilt with datawatch_rebuild_status_counts when they are enabled later on
+    if not getattr(settings, 'DJANGO_DATAWATCH_STATUS_COUNTS', False):
+        return
+
+    Result = apps.get_model('django_datawatch', 'Result')
+    ResultStatusCount = apps.get_model('django_datawatch', 'ResultStatusCount')
+    db = schema_editor.connection.alias
+
+    rows = Result.objects.using(db).order_by().values('slug', 'status').annotate(amount=models.Count('id'))
+    ResultStatusCount.objects.using(db).bulk_create([ResultStatusCount(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datawatch', '0012_result_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultStatusCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.TextField(verbose_name='Module slug')),
+                ('status', models.IntegerField(choices=[(0, 'Unknown'), (1, 'OK'), (2, 'Warning'), (3, 'Critical')], verbose_name='Status')),
+                ('amount', models.IntegerField(default=0, verbose_name='Amount')),
+            ],
+            options={
+                'verbose_name': 'Result status count',
+                'verbose_name_plural': 'Result status counts',
+                'unique_together': {('slug', 'status')},
+            },
+        ),
+        migrations.RunPython(count_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_datawatch', '0013_resultstatuscount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkexecution',
+            name='pending_payloads',
+            field=models.PositiveIntegerField(default=0, verbose_name='Pending payloads'),
+        ),
+    ]
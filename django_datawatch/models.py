@@ -1,10 +1,11 @@
 import json
+from collections import Counter
 from typing import ClassVar
 
 from dateutil import relativedelta
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -12,7 +13,7 @@ from django_extensions.db.fields.json import JSONField
 from model_utils.choices import Choices
 from model_utils.models import TimeStampedModel
 
-from django_datawatch.querysets import CheckExecutionQuerySet
+from django_datawatch.querysets import CheckExecutionQuerySet, ResultStatusCountQuerySet, status_counts_enabled
 
 from .datawatch import datawatch
 from .querysets import ResultQuerySet
@@ -38,6 +39,7 @@ class Result(TimeStampedModel):
     config = JSONField(blank=True, default=dict, verbose_name=_("Configuration"))
 
     payload_description = models.TextField(verbose_name=_("Payload description"))
+    last_checked = models.DateTimeField(null=True, blank=True, verbose_name=_("Last checked"))
 
     acknowledged_by = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
@@ -70,6 +72,15 @@ class Result(TimeStampedModel):
 
     class Meta:
         unique_together = ("slug", "identifier")
+        indexes = (
+            # failed results of the dashboard, ordered by status, excluding unknown and ok
+            models.Index(
+                fields=["-status", "acknowledged_until"],
+                condition=~models.Q(status__in=(0, 1)),
+                name="datawatch_result_failed_idx",
+            ),
+            models.Index(fields=["slug", "-status"], name="datawatch_result_slug_idx"),
+        )
         permissions = (
             ("view", "Can view results dashboard and details"),
             ("acknowledge", "Can acknowledge results"),
@@ -81,6 +92,56 @@ class Result(TimeStampedModel):
     def __str__(self):
         return self.slug
 
+    def save(self, *args, **kwargs):
+        if not status_counts_enabled():
+            super().save(*args, **kwargs)
+            return
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"slug", "status"}.intersection(update_fields):
+            # e.g. acknowledging a result doesn't move it between the counts
+            super().save(*args, **kwargs)
+            return
+
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            changes = Counter()
+            if not self._state.adding:
+                changes[self._lock_count_key(using)] -= 1
+            super().save(*args, **kwargs)
+            changes[self.get_count_key()] += 1
+            ResultStatusCount.objects.using(using).apply(changes)
+
+    def delete(self, using=None, keep_parents=False):
+        if not status_counts_enabled():
+            return super().delete(using=using, keep_parents=keep_parents)
+
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            counted_key = self._lock_count_key(using)
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            ResultStatusCount.objects.using(using).apply({counted_key: -1})
+        return deleted
+
+    @staticmethod
+    def make_count_key(slug, status):
+        return slug, status
+
+    def get_count_key(self):
+        """
+        :return: the (slug, status) key of the status count the result belongs to
+        """
+        return self.make_count_key(self.slug, self.status)
+
+    def _lock_count_key(self, using):
+        """
+        :return: the key of the status count of the stored result, which is locked until the end of the transaction
+                 so concurrent writers can't move it in the meantime, or None if it has been deleted already
+        """
+        stored = type(self)._base_manager.using(using).select_for_update().filter(pk=self.pk)
+        stored = stored.values_list("slug", "status").first()
+        return self.make_count_key(*stored) if stored is not None else None
+
     def acknowledge(self, user, days, reason=None, commit=True):
         # calculate end of requested acknowledgement
         acknowledged_until = timezone.now() + relativedelta.relativedelta(days=days)
@@ -102,14 +163,26 @@ class Result(TimeStampedModel):
     def is_acknowledged(self):
         return self.acknowledged_until and self.acknowledged_until >= timezone.now()
 
+    def is_unchanged(self, status, data, payload_description):
+        """
+        :return: whether saving the given values would leave the stored result as it is
+        """
+        # compare the data the way it would be read back from the database
+        field = self._meta.get_field("data")
+        return (
+            self.status == status
+            and self.payload_description == payload_description
+            and self.data == field.to_python(field.get_prep_value(data))
+        )
+
     def get_check_instance(self):
-        return datawatch.get_check_class(self.slug)()
+        return datawatch.get_check_instance(self.slug)
 
     def get_payload(self):
         return self.get_check_instance().get_payload(self.identifier)
 
     def get_formatted_data(self):
-        return datawatch.get_check_class(self.slug)().format_result_data(self)
+        return self.get_check_instance().format_result_data(self)
 
     def latest_status(self, status):
         return self.status_history.filter(to_status=status).order_by("-created").first()
@@ -134,6 +207,28 @@ class Result(TimeStampedModel):
         return json.dumps(self.get_check_instance().get_config(payload=self.get_payload()), indent=4)
 
 
+class ResultStatusCount(models.Model):
+    """
+    Number of results per check and status, kept up to date when results are saved and deleted
+    """
+
+    STATUS = Result.STATUS
+
+    slug = models.TextField(verbose_name=_("Module slug"))
+    status = models.IntegerField(choices=Result.STATUS, verbose_name=_("Status"))
+    amount = models.IntegerField(default=0, verbose_name=_("Amount"))
+
+    objects = ResultStatusCountQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("slug", "status")
+        verbose_name = _("Result status count")
+        verbose_name_plural = _("Result status counts")
+
+    def __str__(self):
+        return f"{self.slug}: {self.amount}"
+
+
 class ResultStatusHistory(TimeStampedModel):
     result = models.ForeignKey(Result, models.CASCADE, "status_history", "status_history", verbose_name=_("Result"))
     from_status = models.IntegerField(choices=Result.STATUS, verbose_name=_("From status"), null=True)
@@ -142,6 +237,7 @@ class ResultStatusHistory(TimeStampedModel):
     class Meta:
         verbose_name = _("Result status history")
         verbose_name_plural = _("Result status history")
+        indexes = (models.Index(fields=["result", "to_status", "-created"], name="datawatch_history_status_idx"),)
 
 
 class ResultAssignedGroup(models.Model):
@@ -231,8 +327,21 @@ class ResultTag(TimeStampedModel):
 class CheckExecution(models.Model):
     slug = models.TextField(verbose_name=_("Check module slug"), unique=True)
     last_run = models.DateTimeField(verbose_name=_("Last run"))
+    pending_shards = models.PositiveIntegerField(default=0, verbose_name=_("Pending shards"))
+    pending_payloads = models.PositiveIntegerField(default=0, verbose_name=_("Pending payloads"))
+    last_completed = models.DateTimeField(null=True, blank=True, verbose_name=_("Last completed"))
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name=_("Watermark"))
+    last_full_run = models.DateTimeField(null=True, blank=True, verbose_name=_("Last full run"))
+    pending_watermark = models.DateTimeField(null=True, blank=True, verbose_name=_("Pending watermark"))
+    pending_full_run = models.BooleanField(default=True, verbose_name=_("Pending full run"))
 
     objects = CheckExecutionQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.slug} on {self.last_run}"
+
+    def get_since(self):
+        """
+        :return: the watermark the running run checks changes since, or None if it checks all payloads
+        """
+        return None if self.pending_full_run else self.watermark
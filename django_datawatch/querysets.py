@@ -1,20 +1,46 @@
-from django.db import models
-from django.db.models.aggregates import Count
-from django.db.models.expressions import Case, Value, When
-from django.db.models.query_utils import Q
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models.aggregates import Count, Sum
+from django.db.models.expressions import Case, Exists, F, OuterRef, Value, When
 from django.utils import timezone
 
-from django_datawatch.datawatch import datawatch
+from django_datawatch.datawatch import chunked, datawatch
+from django_datawatch.defaults import defaults
+
+# maximum number of bind parameters of a PostgreSQL statement
+MAX_BIND_PARAMETERS = 65535
+
+
+def status_counts_enabled():
+    return getattr(settings, "DJANGO_DATAWATCH_STATUS_COUNTS", defaults["STATUS_COUNTS"])
+
+
+class StatusNameMixin:
+    def with_status_name(self):
+        case = Case(output_field=models.CharField())
+        for status_value in self.model.STATUS._db_values:
+            case.cases.append(
+                When(status=status_value, then=Value(str(self.model.STATUS[status_value]))),
+            )
+        return self.annotate(status_name=case)
 
 
-class ResultQuerySet(models.QuerySet):
+class ResultQuerySet(StatusNameMixin, models.QuerySet):
     def for_user(self, user):
         # Should only check assigned groups if result has no assigned users
+        # correlated EXISTS subqueries are index lookups on the assignments and don't multiply the results,
+        # unlike joins which would need a distinct
+        assigned_users = self.model.assigned_users.through.objects.filter(result_id=OuterRef("pk"))
+        assigned_groups = self.model.assigned_groups.through.objects.filter(result_id=OuterRef("pk"))
         return self.filter(
-            Q(assigned_users=user)
-            | Q(assigned_users__isnull=True, assigned_groups__in=user.groups.all())
-            | Q(assigned_users__isnull=True, assigned_groups__isnull=True),
-        ).distinct()
+            Exists(assigned_users.filter(user_id=user.pk))
+            | (
+                ~Exists(assigned_users)
+                & (Exists(assigned_groups.filter(group_id__in=user.groups.values("pk"))) | ~Exists(assigned_groups))
+            ),
+        )
 
     def failed(self):
         return self.exclude(status__in=(self.model.STATUS.unknown, self.model.STATUS.ok))
@@ -28,17 +54,111 @@ class ResultQuerySet(models.QuerySet):
     def unacknowledged(self):
         return self.exclude(acknowledged_until__gt=timezone.now())
 
-    def with_status_name(self):
-        case = Case(output_field=models.CharField())
-        for status_value in self.model.STATUS._db_values:
-            case.cases.append(
-                When(status=status_value, then=Value(str(self.model.STATUS[status_value]))),
-            )
-        return self.annotate(status_name=case)
-
     def get_stats(self):
         return self.values("status").annotate(amount=Count("id", distinct=True)).with_status_name()
 
+    def get_status_counts(self):
+        """
+        :return: Counter of the results by (slug, status)
+        """
+        rows = self.order_by().values("slug", "status").annotate(amount=Count("id"))
+        return Counter({(row["slug"], row["status"]): row["amount"] for row in rows})
+
+    def delete(self):
+        if not status_counts_enabled():
+            return super().delete()
+
+        from django_datawatch.models import ResultStatusCount  # noqa: PLC0415
+
+        db = self._get_write_db()
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"]) or 500
+        deleted, deleted_per_model = 0, Counter()
+        with transaction.atomic(using=db):
+            # only the locked results are deleted and counted, results deleted concurrently in the meantime are
+            # skipped instead of being subtracted twice
+            changes = Counter()
+            pks = []
+            for pk, slug, status in self.order_by().select_for_update(of=("self",)).values_list("pk", "slug", "status"):
+                pks.append(pk)
+                changes[self.model.make_count_key(slug, status)] -= 1
+            for chunk in chunked(pks, batch_size):
+                amount, amounts = self.model._base_manager.using(db).filter(pk__in=chunk).delete()
+                deleted += amount
+                deleted_per_model.update(amounts)
+            ResultStatusCount.objects.using(db).apply(changes)
+        return deleted, dict(deleted_per_model)
+
+    def supports_upsert(self):
+        return connections[self._get_write_db()].vendor == "postgresql"
+
+    def upsert(self, results, unacknowledge=False):
+        """
+        Saves the given results with one INSERT ... ON CONFLICT (slug, identifier) DO UPDATE statement per chunk of
+        DJANGO_DATAWATCH_BATCH_SIZE results, updating the status, data, payload description and timestamps of results
+        that already exist. Only supported on PostgreSQL, see `.supports_upsert()`.
+
+        The statement locks the existing results, so their previous status is the one it overwrote even if they are
+        written concurrently. Results inserted concurrently after the statement started are written by another one.
+
+        :param results: result instances, their primary keys are ignored
+        :param unacknowledge: reset the acknowledgement of updated results
+        :return: list of the saved results as stored in the database, annotated with their `previous_status`,
+                 which is None for created results
+        """
+        db = self._get_write_db()
+        # each result takes a bind parameter per column and two for its key, PostgreSQL allows 65535 per statement
+        max_batch_size = MAX_BIND_PARAMETERS // (len(self.model._meta.concrete_fields) + 1)
+        batch_size = getattr(settings, "DJANGO_DATAWATCH_BATCH_SIZE", defaults["BATCH_SIZE"]) or max_batch_size
+        batch_size = min(batch_size, max_batch_size)
+        saved = []
+        for chunk in chunked(results, batch_size):
+            pending = chunk
+            while pending:
+                sql, params = self._get_upsert_sql(pending, unacknowledge, connections[db])
+                rows = list(self.model.objects.raw(sql, params, using=db))
+                saved += rows
+                written = {row.identifier for row in rows}
+                pending = [result for result in pending if result.identifier not in written]
+        return saved
+
+    def _get_upsert_sql(self, results, unacknowledge, connection):
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        update_fields = ["status", "data", "payload_description", "modified", "last_checked"]
+
+        updates = [f"{qn(column)} = EXCLUDED.{qn(column)}" for column in update_fields]
+        if unacknowledge:
+            updates += [
+                f"{qn(self.model._meta.get_field(name).column)} = NULL"
+                for name in ("acknowledged_by", "acknowledged_at", "acknowledged_until")
+            ]
+
+        keys, rows, params = [], [], []
+        for result in results:
+            keys.append("(%s, %s)")
+            params += [result.slug, result.identifier]
+        for result in results:
+            rows.append(f"({', '.join(['%s'] * len(fields))})")
+            params += [field.get_db_prep_save(getattr(result, field.attname), connection) for field in fields]
+
+        # the CTE locks the existing rows and yields their previous status, rows that are not visible to it have been
+        # inserted concurrently and are neither updated nor returned
+        # only quoted identifiers and placeholders are interpolated, all values are passed as params
+        sql = (
+            "WITH previous AS MATERIALIZED ("  # noqa: S608
+            f"SELECT id, status FROM {table} WHERE (slug, identifier) IN ({', '.join(keys)}) FOR UPDATE) "
+            f"INSERT INTO {table} ({', '.join(qn(field.column) for field in fields)}) VALUES {', '.join(rows)} "
+            f"ON CONFLICT (slug, identifier) DO UPDATE SET {', '.join(updates)} "
+            f"WHERE {table}.id IN (SELECT id FROM previous) "
+            f"RETURNING {table}.*, "
+            f"(SELECT previous.status FROM previous WHERE previous.id = {table}.id) AS previous_status"
+        )
+        return sql, params
+
+    def _get_write_db(self):
+        return self._db or router.db_for_write(self.model)
+
     def ghost_results(self):
         """
         :return: results that do not have checks anymore (check has been deleted)
@@ -46,9 +166,123 @@ class ResultQuerySet(models.QuerySet):
         return self.exclude(slug__in=datawatch.get_all_registered_check_slugs())
 
 
+class ResultStatusCountQuerySet(StatusNameMixin, models.QuerySet):
+    def failed(self):
+        return self.exclude(status__in=(self.model.STATUS.unknown, self.model.STATUS.ok))
+
+    def get_stats(self):
+        return self.values("status").annotate(amount=Sum("amount")).filter(amount__gt=0).with_status_name()
+
+    def apply(self, changes):
+        """
+        Adds the given amounts to the counts, creating missing ones
+
+        :param changes: mapping of (slug, status) to the amount to add, None keys are ignored
+        """
+        db = self._db or router.db_for_write(self.model)
+        # a consistent order of the updates prevents deadlocks of concurrent writers
+        for (slug, status), amount in sorted(item for item in changes.items() if item[0] and item[1]):
+            counts = self.filter(slug=slug, status=status)
+            if counts.update(amount=F("amount") + amount):
+                continue
+            try:
+                with transaction.atomic(using=db):
+                    self.create(slug=slug, status=status, amount=amount)
+            except IntegrityError:
+                # created concurrently
+                counts.update(amount=F("amount") + amount)
+
+    def rebuild(self):
+        """
+        Replaces all counts by the ones of the current results, e.g. after changing results with `QuerySet.update`
+
+        :return: number of counts
+        """
+        from django_datawatch.models import Result  # noqa: PLC0415
+
+        db = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            counts = Result.objects.using(db).get_status_counts()
+            self.all().delete()
+            self.bulk_create(
+                [self.model(slug=slug, status=status, amount=amount) for (slug, status), amount in counts.items()],
+            )
+        return len(counts)
+
+
 class CheckExecutionQuerySet(models.QuerySet):
     def ghost_executions(self):
         """
         :return: check executions that do not have checks anymore (check has been deleted)
         """
         return self.exclude(slug__in=datawatch.get_all_registered_check_slugs())
+
+    def start_run(self, slug, watermark, full_run=True, shards=0):
+        """
+        Marks the start of a run of the check, split into `shards` which have to be finished with `.finish_shard()`.
+        The watermark only becomes the watermark of the check once the run is completed with `.complete_run()`.
+
+        :return: id of the run, passed along with the payloads dispatched to other processes
+        """
+        self.get_or_create(slug=slug, defaults={"last_run": watermark})
+        self.filter(slug=slug).update(
+            pending_shards=shards,
+            pending_payloads=0,
+            pending_watermark=watermark,
+            pending_full_run=full_run,
+        )
+        return watermark.isoformat()
+
+    def add_payloads(self, slug, run_id, amount):
+        """
+        Counts payloads dispatched by the run, which have to be finished with `.finish_payloads()`
+        """
+        self.filter(slug=slug, pending_watermark=run_id).update(pending_payloads=F("pending_payloads") + amount)
+
+    def finish_payloads(self, slug, run_id, amount):
+        """
+        :return: True if these have been the last pending payloads of the run, which is then marked as completed
+        """
+        with transaction.atomic():
+            execution = self.select_for_update().filter(slug=slug, pending_watermark=run_id).first()
+            if execution is None or not execution.pending_payloads:
+                return False
+            execution.pending_payloads = max(execution.pending_payloads - amount, 0)
+            execution.save(update_fields=["pending_payloads"])
+            if execution.pending_payloads or execution.pending_shards:
+                return False
+            self.complete_run(slug)
+            return True
+
+    def finish_shard(self, slug, run_id):
+        """
+        :return: True if this has been the last pending shard of the run and no dispatched payloads are pending,
+                 the run is then marked as completed
+        """
+        with transaction.atomic():
+            execution = (
+                self.select_for_update().filter(slug=slug, pending_watermark=run_id, pending_shards__gt=0).first()
+            )
+            if execution is None:
+                return False
+            execution.pending_shards -= 1
+            execution.save(update_fields=["pending_shards"])
+            if execution.pending_shards or execution.pending_payloads:
+                return False
+            self.complete_run(slug)
+            return True
+
+    def complete_run(self, slug):
+        """
+        Advances the watermark of the check to the start of the completed run
+        """
+        execution = self.filter(slug=slug).first()
+        if execution is None:
+            return
+        execution.last_completed = timezone.now()
+        if execution.pending_watermark is not None:
+            execution.watermark = execution.pending_watermark
+            if execution.pending_full_run:
+                execution.last_full_run = execution.pending_watermark
+        execution.pending_watermark = None
+        execution.save(update_fields=["last_completed", "watermark", "last_full_run", "pending_watermark"])
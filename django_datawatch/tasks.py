@@ -14,6 +14,12 @@ def django_datawatch_enqueue(slug, *args, **kwargs):
     synchronous.Backend().enqueue(slug=slug)
 
 
+@shared_task
+def django_datawatch_enqueue_shard(slug, shard, run_id=None, *args, **kwargs):
+    logger.debug("enqueuing checks for %s in shard %s", slug, shard)
+    synchronous.Backend().enqueue_shard(slug=slug, shard=shard, run_id=run_id)
+
+
 @shared_task
 def django_datawatch_refresh(slug, *args, **kwargs):
     logger.debug("refreshing check results for %s", slug)
@@ -21,7 +27,7 @@ def django_datawatch_refresh(slug, *args, **kwargs):
 
 
 @shared_task
-def django_datawatch_run(slug, identifier, user_forced_refresh=False, *args, **kwargs):
+def django_datawatch_run(slug, identifier, user_forced_refresh=False, run_id=None, *args, **kwargs):
     logger.debug(
         "running check %s for identifier %s (forced refresh %s)",
         slug,
@@ -32,9 +38,16 @@ def django_datawatch_run(slug, identifier, user_forced_refresh=False, *args, **k
         slug=slug,
         identifier=identifier,
         user_forced_refresh=user_forced_refresh,
+        run_id=run_id,
     )
 
 
+@shared_task
+def django_datawatch_run_batch(slug, identifiers, run_id=None, *args, **kwargs):
+    logger.debug("running check %s for %s identifiers", slug, len(identifiers))
+    synchronous.Backend().run_batch(slug=slug, identifiers=identifiers, run_id=run_id)
+
+
 @shared_task
 def django_datawatch_scheduler(*args, **kwargs):
     Scheduler().run_checks(force=False)
@@ -0,0 +1,17 @@
+import importlib
+
+import django
+from django.conf import settings
+
+
+def setup(database_name, *modules):
+    """
+    Initializer of spawned worker processes, which have to use the test database of the parent process
+    and register the checks of the given test modules.
+
+    This module must not import any models, it is imported by the workers before django has been set up.
+    """
+    settings.DATABASES["default"]["NAME"] = database_name
+    django.setup()
+    for module in modules:
+        importlib.import_module(module)
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test.testcases import TestCase
+
+from django_datawatch.backends import synchronous
+from django_datawatch.base import BaseCheck, CheckResponse, DatawatchCheckSkipError
+from django_datawatch.models import Result, ResultStatusHistory
+from django_datawatch.tests.test_base_check import StatusPayload
+
+
+class StatusServer(ThreadingHTTPServer):
+    """
+    Stub HTTP service answering with the status given in the path, e.g. GET /2 returns 2
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StatusRequestHandler)
+        self.lock = threading.Lock()
+        self.active_requests = 0
+        self.max_active_requests = 0
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active_requests += 1
+            self.server.max_active_requests = max(self.server.max_active_requests, self.server.active_requests)
+        time.sleep(0.05)
+        with self.server.lock:
+            self.server.active_requests -= 1
+
+        body = self.path.lstrip("/").encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpStatusCheck(BaseCheck):
+    check_concurrency = 3
+    address = None
+
+    async def check(self, payload):
+        reader, writer = await asyncio.open_connection(*self.address)
+        writer.write(f"GET /{payload.status} HTTP/1.0\r\n\r\n".encode())
+        await writer.drain()
+        body = (await reader.read()).split(b"\r\n\r\n", 1)[1]
+        writer.close()
+        await writer.wait_closed()
+
+        if body == b"None":
+            raise DatawatchCheckSkipError
+        response = CheckResponse()
+        response.set_status(int(body))
+        return response
+
+    async def generate(self):
+        for pk in range(6):
+            await asyncio.sleep(0)
+            yield StatusPayload(pk, Result.STATUS.ok if pk % 2 else Result.STATUS.critical)
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+class AsyncCheckTestCase(TestCase):
+    def setUp(self) -> None:
+        self.server = StatusServer()
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.check = HttpStatusCheck()
+        self.check.address = self.server.server_address
+
+    def test_handle_many_runs_checks_concurrently(self):
+        payloads = [StatusPayload(pk, Result.STATUS.warning) for pk in range(9)]
+
+        results = self.check.handle_many(payloads)
+
+        self.assertEqual(self.server.max_active_requests, self.check.check_concurrency)
+        self.assertEqual([result.status for result in results], [Result.STATUS.warning] * 9)
+        self.assertEqual(ResultStatusHistory.objects.count(), 9)
+
+    def test_handle_many_skips_payloads(self):
+        self.check.handle_many([StatusPayload(0, Result.STATUS.ok), StatusPayload(1, Result.STATUS.ok)])
+
+        self.check.handle_many([StatusPayload(0, None), StatusPayload(1, Result.STATUS.critical)])
+
+        self.assertEqual(list(Result.objects.values_list("identifier", "status")), [("1", Result.STATUS.critical)])
+
+    def test_generate_payloads_from_async_generator(self):
+        self.assertEqual([payload.pk for payload in self.check.generate_payloads()], list(range(6)))
+        self.assertEqual(list(self.check.generate_identifiers()), list(range(6)))
+
+    def test_generate_payloads_closes_async_generator(self):
+        closed = []
+
+        class ClosingCheck(HttpStatusCheck):
+            async def generate(self):
+                try:
+                    yield StatusPayload(0, Result.STATUS.ok)
+                    yield StatusPayload(1, Result.STATUS.ok)
+                finally:
+                    closed.append(True)
+
+        payloads = ClosingCheck().generate_payloads()
+        next(payloads)
+        payloads.close()
+
+        self.assertEqual(closed, [True])
+
+    def test_synchronous_backend_runs_async_check(self):
+        synchronous.Backend()._handle(self.check, self.check.generate_payloads())
+
+        self.assertEqual(
+            list(Result.objects.order_by("identifier").values_list("status", flat=True)),
+            [Result.STATUS.critical, Result.STATUS.ok] * 3,
+        )
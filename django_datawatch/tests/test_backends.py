@@ -0,0 +1,663 @@
+import datetime as dt
+import multiprocessing
+import threading
+from unittest import mock, skipUnless
+
+import django
+from celery.schedules import crontab
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.testcases import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from django_datawatch.backends import celery, multiprocess, synchronous, threaded
+from django_datawatch.backends.base import BaseBackend
+from django_datawatch.base import BaseCheck, CheckResponse
+from django_datawatch.datawatch import datawatch
+from django_datawatch.models import CheckExecution, Result
+from django_datawatch.tests import spawn
+
+User = get_user_model()
+
+
+@datawatch.register
+class CheckUserIsActive(BaseCheck):
+    model_class = User
+
+    def generate(self):
+        yield from User.objects.order_by("pk")
+
+    def check(self, payload):
+        response = CheckResponse()
+        response.set_status(Result.STATUS.ok if payload.is_active else Result.STATUS.critical)
+        return response
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+class SynchronousBackendTestCase(TestCase):
+    def setUp(self) -> None:
+        self.backend = synchronous.Backend()
+        self.slug = CheckUserIsActive().slug
+        self.users = [User.objects.create_user(**{User.USERNAME_FIELD: f"user_{i}"}) for i in range(5)]
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_dispatches_chunks(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+
+        self.backend.enqueue(slug=self.slug)
+
+        self.assertEqual(
+            [call.kwargs["identifiers"] for call in backend.run_batch.call_args_list],
+            [[self.users[0].pk, self.users[1].pk], [self.users[2].pk, self.users[3].pk], [self.users[4].pk]],
+        )
+        backend.run.assert_not_called()
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=None)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_without_batch_size_dispatches_single_runs(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+
+        self.backend.enqueue(slug=self.slug)
+
+        self.assertEqual(backend.run.call_count, len(self.users))
+        backend.run_batch.assert_not_called()
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_in_process_reuses_generated_payloads(self, mock_get_backend):
+        mock_get_backend.return_value = self.backend
+
+        with (
+            mock.patch.object(CheckUserIsActive, "get_payload") as mock_get_payload,
+            mock.patch.object(CheckUserIsActive, "get_payloads") as mock_get_payloads,
+        ):
+            self.backend.enqueue(slug=self.slug)
+
+        mock_get_payload.assert_not_called()
+        mock_get_payloads.assert_not_called()
+        self.assertEqual(Result.objects.filter(slug=self.slug).count(), len(self.users))
+
+    def test_run_batch_saves_results(self):
+        self.users[0].is_active = False
+        self.users[0].save()
+
+        self.backend.run_batch(slug=self.slug, identifiers=[user.pk for user in self.users])
+
+        results = Result.objects.filter(slug=self.slug)
+        self.assertEqual(results.count(), len(self.users))
+        self.assertEqual(results.get(identifier=self.users[0].pk).status, Result.STATUS.critical)
+
+    def test_run_batch_deletes_results_of_missing_payloads(self):
+        self.backend.run_batch(slug=self.slug, identifiers=[user.pk for user in self.users])
+        deleted_pk = self.users[0].pk
+        self.users[0].delete()
+
+        self.backend.run_batch(slug=self.slug, identifiers=[deleted_pk, self.users[1].pk])
+
+        self.assertFalse(Result.objects.filter(slug=self.slug, identifier=deleted_pk).exists())
+        self.assertEqual(Result.objects.filter(slug=self.slug).count(), len(self.users) - 1)
+
+
+@datawatch.register
+class CheckUserIsActiveSharded(BaseCheck):
+    model_class = User
+    shards = 2
+
+    def get_queryset(self):
+        return User.objects.all()
+
+    def check(self, payload):
+        response = CheckResponse()
+        response.set_status(Result.STATUS.ok if payload.is_active else Result.STATUS.critical)
+        return response
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+class ShardedEnqueueTestCase(TestCase):
+    def setUp(self) -> None:
+        self.backend = synchronous.Backend()
+        self.check = CheckUserIsActiveSharded()
+        self.users = [User.objects.create_user(**{User.USERNAME_FIELD: f"user_{i}"}) for i in range(5)]
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_fans_out_one_call_per_shard(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+
+        self.backend.enqueue(slug=self.check.slug)
+
+        self.assertEqual(
+            [call.kwargs["shard"] for call in backend.enqueue_shard.call_args_list],
+            self.check.get_shards(),
+        )
+        self.assertEqual(backend.enqueue_shard.call_count, 2)
+        self.assertEqual(CheckExecution.objects.get(slug=self.check.slug).pending_shards, 2)
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_in_process_completes_all_shards(self, mock_get_backend):
+        mock_get_backend.return_value = self.backend
+
+        self.backend.enqueue(slug=self.check.slug)
+
+        self.assertEqual(Result.objects.filter(slug=self.check.slug).count(), len(self.users))
+        execution = CheckExecution.objects.get(slug=self.check.slug)
+        self.assertEqual(execution.pending_shards, 0)
+        self.assertIsNotNone(execution.last_completed)
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_run_is_completed_with_last_shard(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+        self.backend.enqueue(slug=self.check.slug)
+        first_shard, second_shard = (call.kwargs for call in backend.enqueue_shard.call_args_list)
+
+        self.backend.enqueue_shard(**first_shard)
+        self.assertIsNone(CheckExecution.objects.get(slug=self.check.slug).last_completed)
+        self.backend.enqueue_shard(**second_shard)
+
+        # the dispatched payloads have not been checked yet
+        execution = CheckExecution.objects.get(slug=self.check.slug)
+        self.assertEqual((execution.pending_shards, execution.pending_payloads), (0, len(self.users)))
+        self.assertIsNone(execution.last_completed)
+        dispatched = [pk for call in backend.run_batch.call_args_list for pk in call.kwargs["identifiers"]]
+        self.assertEqual(dispatched, [user.pk for user in self.users])
+
+        for call in backend.run_batch.call_args_list:
+            self.backend.run_batch(
+                slug=self.check.slug,
+                identifiers=call.kwargs["identifiers"],
+                run_id=call.kwargs["run_id"],
+            )
+        self.assertIsNotNone(CheckExecution.objects.get(slug=self.check.slug).last_completed)
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_shards_of_superseded_run_are_skipped(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+        self.backend.enqueue(slug=self.check.slug)
+        previous_shards = [call.kwargs for call in backend.enqueue_shard.call_args_list]
+        backend.reset_mock()
+        self.backend.enqueue(slug=self.check.slug)
+
+        mock_get_backend.return_value = self.backend
+        for shard in previous_shards:
+            self.backend.enqueue_shard(**shard)
+
+        execution = CheckExecution.objects.get(slug=self.check.slug)
+        self.assertEqual(execution.pending_shards, 2)
+        self.assertIsNone(execution.last_completed)
+        self.assertFalse(Result.objects.filter(slug=self.check.slug).exists())
+
+        for call in backend.enqueue_shard.call_args_list:
+            self.backend.enqueue_shard(**call.kwargs)
+        self.assertIsNotNone(CheckExecution.objects.get(slug=self.check.slug).last_completed)
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_run_without_shards_is_completed(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+        User.objects.all().delete()
+
+        self.backend.enqueue(slug=self.check.slug)
+
+        backend.enqueue_shard.assert_not_called()
+        execution = CheckExecution.objects.get(slug=self.check.slug)
+        self.assertIsNone(execution.pending_watermark)
+        self.assertIsNotNone(execution.last_completed)
+
+    def test_get_shards_splits_primary_key_range(self):
+        low, high = self.users[0].pk, self.users[-1].pk
+
+        self.assertEqual(self.check.get_shards(), [[low, low + 3], [low + 3, high + 1]])
+
+    def test_get_shards_without_payloads(self):
+        User.objects.all().delete()
+
+        self.assertEqual(self.check.get_shards(), [])
+
+    def test_get_shards_of_unsharded_check(self):
+        self.assertIsNone(CheckUserIsActive().get_shards())
+
+    def test_get_shards_requires_integer_primary_key(self):
+        Session.objects.create(session_key="a" * 32, session_data="", expire_date=timezone.now())
+
+        with (
+            mock.patch.object(self.check, "get_queryset", return_value=Session.objects.all()),
+            self.assertRaises(NotImplementedError),
+        ):
+            self.check.get_shards()
+
+
+@datawatch.register
+class CheckUserIsActiveIncremental(BaseCheck):
+    model_class = User
+    incremental = True
+    modified_field = "last_login"
+
+    def get_queryset(self):
+        return User.objects.all()
+
+    def check(self, payload):
+        response = CheckResponse()
+        response.set_status(Result.STATUS.ok if payload.is_active else Result.STATUS.critical)
+        return response
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+@mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend", return_value=synchronous.Backend())
+class IncrementalEnqueueTestCase(TestCase):
+    def setUp(self) -> None:
+        self.backend = synchronous.Backend()
+        self.check = CheckUserIsActiveIncremental()
+        self.users = [
+            User.objects.create_user(**{User.USERNAME_FIELD: f"user_{i}"}, last_login=timezone.now()) for i in range(3)
+        ]
+
+    def _enqueue(self):
+        with mock.patch.object(CheckUserIsActiveIncremental, "check_many", autospec=True) as mock_check_many:
+            mock_check_many.side_effect = BaseCheck.check_many
+            self.backend.enqueue(slug=self.check.slug)
+        return [payload.pk for call in mock_check_many.call_args_list for payload in call.args[1]]
+
+    def test_first_run_checks_all_payloads(self, mock_get_backend):
+        self.assertEqual(self._enqueue(), [user.pk for user in self.users])
+
+        execution = CheckExecution.objects.get(slug=self.check.slug)
+        self.assertIsNotNone(execution.watermark)
+        self.assertEqual(execution.last_full_run, execution.watermark)
+
+    def test_following_run_only_checks_modified_payloads(self, mock_get_backend):
+        self._enqueue()
+        User.objects.filter(pk=self.users[1].pk).update(last_login=timezone.now())
+
+        self.assertEqual(self._enqueue(), [self.users[1].pk])
+
+        execution = CheckExecution.objects.get(slug=self.check.slug)
+        self.assertGreater(execution.watermark, execution.last_full_run)
+
+    def test_full_run_when_due(self, mock_get_backend):
+        self._enqueue()
+
+        with mock.patch.object(CheckUserIsActiveIncremental, "full_run_every", crontab(minute="*")):
+            CheckExecution.objects.update(last_full_run=timezone.now() - dt.timedelta(minutes=5))
+            self.assertEqual(self._enqueue(), [user.pk for user in self.users])
+
+    def test_watermark_is_kept_if_run_fails(self, mock_get_backend):
+        self._enqueue()
+        watermark = CheckExecution.objects.get(slug=self.check.slug).watermark
+        User.objects.filter(pk=self.users[1].pk).update(last_login=timezone.now())
+
+        with (
+            mock.patch.object(CheckUserIsActiveIncremental, "check", side_effect=RuntimeError),
+            self.assertRaises(RuntimeError),
+        ):
+            self.backend.enqueue(slug=self.check.slug)
+
+        self.assertEqual(CheckExecution.objects.get(slug=self.check.slug).watermark, watermark)
+        self.assertEqual(self._enqueue(), [self.users[1].pk])
+
+    def test_sharded_run_advances_watermark_with_last_shard(self, mock_get_backend):
+        self._enqueue()
+        User.objects.filter(pk=self.users[1].pk).update(last_login=timezone.now())
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+
+        with mock.patch.object(CheckUserIsActiveIncremental, "shards", 2):
+            self.backend.enqueue(slug=self.check.slug)
+            first_shard, second_shard = (call.kwargs for call in backend.enqueue_shard.call_args_list)
+            watermark = CheckExecution.objects.get(slug=self.check.slug).watermark
+
+            mock_get_backend.return_value = self.backend
+            self.backend.enqueue_shard(**first_shard)
+            self.assertEqual(CheckExecution.objects.get(slug=self.check.slug).watermark, watermark)
+            self.backend.enqueue_shard(**second_shard)
+
+        self.assertGreater(CheckExecution.objects.get(slug=self.check.slug).watermark, watermark)
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    def test_async_run_advances_watermark_once_payloads_are_checked(self, mock_get_backend):
+        self._enqueue()
+        watermark = CheckExecution.objects.get(slug=self.check.slug).watermark
+        User.objects.update(last_login=timezone.now())
+        backend = mock.Mock(spec=BaseBackend, runs_in_process=False)
+        mock_get_backend.return_value = backend
+
+        self.backend.enqueue(slug=self.check.slug)
+        first_batch, second_batch = backend.run_batch.call_args_list
+
+        self.assertEqual(CheckExecution.objects.get(slug=self.check.slug).watermark, watermark)
+        with (
+            mock.patch.object(CheckUserIsActiveIncremental, "check", side_effect=RuntimeError),
+            self.assertRaises(RuntimeError),
+        ):
+            self.backend.run_batch(
+                slug=self.check.slug,
+                identifiers=first_batch.kwargs["identifiers"],
+                run_id=first_batch.kwargs["run_id"],
+            )
+        self.backend.run_batch(
+            slug=self.check.slug,
+            identifiers=second_batch.kwargs["identifiers"],
+            run_id=second_batch.kwargs["run_id"],
+        )
+        self.assertEqual(CheckExecution.objects.get(slug=self.check.slug).watermark, watermark)
+
+        self.backend.run_batch(
+            slug=self.check.slug,
+            identifiers=first_batch.kwargs["identifiers"],
+            run_id=first_batch.kwargs["run_id"],
+        )
+        self.assertGreater(CheckExecution.objects.get(slug=self.check.slug).watermark, watermark)
+
+
+class CeleryBackendTestCase(TestCase):
+    @mock.patch("django_datawatch.backends.celery.django_datawatch_run_batch")
+    def test_run_batch_publishes_single_task(self, mock_task):
+        celery.Backend().run_batch(slug="slug", identifiers=[1, 2, 3], queue="individual_queue")
+
+        mock_task.apply_async.assert_called_once_with(
+            kwargs={"slug": "slug", "identifiers": [1, 2, 3]},
+            queue="individual_queue",
+        )
+
+    @mock.patch("django_datawatch.backends.celery.django_datawatch_enqueue_shard")
+    def test_enqueue_shard_publishes_task(self, mock_task):
+        celery.Backend().enqueue_shard(slug="slug", shard=[1, 10], queue="individual_queue", run_id="run")
+
+        mock_task.apply_async.assert_called_once_with(
+            kwargs={"slug": "slug", "shard": [1, 10], "run_id": "run"},
+            queue="individual_queue",
+        )
+
+
+class InlinePool:
+    def __init__(self):
+        self.chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.chunks.append(args[0][1])
+        try:
+            result = func(*args)
+        except Exception as e:  # noqa: BLE001
+            error_callback(e)
+        else:
+            callback(result)
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class DelayedPool(InlinePool):
+    """
+    Completes every chunk shortly after it has been handed out, counting the chunks in flight
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.timers = []
+        self.lock = threading.Lock()
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.chunks.append(args[0][1])
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        def complete():
+            with self.lock:
+                self.in_flight -= 1
+            callback(len(args[0][1]))
+
+        timer = threading.Timer(0.01, complete)
+        self.timers.append(timer)
+        timer.start()
+
+    def join(self):
+        for timer in self.timers:
+            timer.join()
+
+
+@mock.patch("django_datawatch.backends.multiprocess.close_old_connections")
+class MultiprocessBackendTestCase(TestCase):
+    def setUp(self) -> None:
+        self.backend = multiprocess.Backend()
+        self.slug = CheckUserIsActive().slug
+        self.users = [User.objects.create_user(**{User.USERNAME_FIELD: f"user_{i}"}) for i in range(5)]
+        self.pool = InlinePool()
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_distributes_chunks_to_pool(self, mock_get_backend, mock_close_old_connections):
+        mock_get_backend.return_value = self.backend
+
+        with mock.patch.object(self.backend, "_get_pool", return_value=self.pool):
+            self.backend.enqueue(slug=self.slug)
+
+        self.assertEqual(
+            self.pool.chunks,
+            [[self.users[0].pk, self.users[1].pk], [self.users[2].pk, self.users[3].pk], [self.users[4].pk]],
+        )
+        self.assertEqual(Result.objects.filter(slug=self.slug).count(), len(self.users))
+        self.assertEqual(mock_close_old_connections.call_count, 2 * len(self.pool.chunks))
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=1, DJANGO_DATAWATCH_PROCESSES=1)
+    def test_bounded_amount_of_chunks_in_flight(self, mock_close_old_connections):
+        pool = DelayedPool()
+
+        with mock.patch.object(self.backend, "_get_pool", return_value=pool):
+            self.backend._dispatch(CheckUserIsActive(), (user.pk for user in self.users))
+
+        self.assertEqual(pool.chunks, [[user.pk] for user in self.users])
+        self.assertLessEqual(pool.max_in_flight, 2)
+        self.assertEqual(pool.in_flight, 0)
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    def test_chunks_are_handed_out_while_generating(self, mock_close_old_connections):
+        generated = []
+
+        def generate_identifiers():
+            for user in self.users:
+                generated.append(user.pk)
+                yield user.pk
+
+        def run_batch(args):
+            self.assertEqual(generated, [user.pk for user in self.users[: len(self.pool.chunks) * 2]])
+            return len(args[1])
+
+        with (
+            mock.patch.object(self.backend, "_get_pool", return_value=self.pool),
+            mock.patch("django_datawatch.backends.multiprocess._run_batch", side_effect=run_batch),
+        ):
+            self.backend._dispatch(CheckUserIsActive(), generate_identifiers())
+
+        self.assertEqual(len(self.pool.chunks), 3)
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    def test_failing_chunk_is_raised(self, mock_close_old_connections):
+        with (
+            mock.patch.object(self.backend, "_get_pool", return_value=self.pool),
+            mock.patch("django_datawatch.backends.multiprocess._run_batch", side_effect=RuntimeError),
+            self.assertRaises(RuntimeError),
+        ):
+            self.backend._dispatch(CheckUserIsActive(), [user.pk for user in self.users])
+
+        # no further chunks are handed out after a worker failed
+        self.assertEqual(len(self.pool.chunks), 1)
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=None)
+    def test_refresh_without_batch_size_distributes_single_identifiers(self, mock_close_old_connections):
+        synchronous.Backend().run_batch(slug=self.slug, identifiers=[user.pk for user in self.users])
+
+        with mock.patch.object(self.backend, "_get_pool", return_value=self.pool):
+            self.backend.refresh(slug=self.slug)
+
+        self.assertEqual(len(self.pool.chunks), len(self.users))
+
+    def test_run_is_executed_in_calling_process(self, mock_close_old_connections):
+        with mock.patch.object(self.backend, "_get_pool") as mock_get_pool:
+            self.backend.run(slug=self.slug, identifier=self.users[0].pk)
+
+        mock_get_pool.assert_not_called()
+        self.assertTrue(Result.objects.filter(slug=self.slug, identifier=self.users[0].pk).exists())
+
+    @override_settings(DJANGO_DATAWATCH_PROCESSES=3)
+    def test_pool_uses_configured_processes(self, mock_close_old_connections):
+        with mock.patch("django_datawatch.backends.multiprocess.multiprocessing.get_context") as mock_get_context:
+            self.backend._get_pool()
+
+        mock_get_context.assert_called_once_with("spawn")
+        mock_get_context.return_value.Pool.assert_called_once_with(processes=3, initializer=django.setup)
+
+
+@skipUnless(connection.vendor == "postgresql", "the workers write concurrently, which SQLite doesn't support")
+@override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2, DJANGO_DATAWATCH_PROCESSES=2)
+class MultiprocessPoolTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.backend = multiprocess.Backend()
+        self.check = CheckUserIsActive()
+        self.users = [User.objects.create_user(**{User.USERNAME_FIELD: f"user_{i}"}) for i in range(5)]
+
+    def _get_pool(self):
+        # the spawned workers register the checks of this module and use the test database
+        return multiprocessing.get_context("spawn").Pool(
+            processes=2,
+            initializer=spawn.setup,
+            initargs=(connection.settings_dict["NAME"], __name__),
+        )
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_enqueue_runs_chunks_in_spawned_processes(self, mock_get_backend):
+        mock_get_backend.return_value = self.backend
+        generate_identifiers = self.check.generate_identifiers
+        threads = []
+
+        def generate_in_thread(*args, **kwargs):
+            for identifier in generate_identifiers(*args, **kwargs):
+                threads.append(threading.current_thread())
+                yield identifier
+
+        with (
+            mock.patch.object(self.backend, "_get_pool", side_effect=self._get_pool),
+            mock.patch.object(self.backend, "_get_check_instance", return_value=self.check),
+            mock.patch.object(self.check, "generate_identifiers", side_effect=generate_in_thread),
+        ):
+            self.backend.enqueue(slug=self.check.slug)
+
+        self.assertEqual(set(threads), {threading.current_thread()})
+        self.assertEqual(
+            sorted(Result.objects.filter(slug=self.check.slug).values_list("identifier", flat=True)),
+            sorted(str(user.pk) for user in self.users),
+        )
+
+
+@override_settings(DJANGO_DATAWATCH_THREADS=2, DJANGO_DATAWATCH_QUEUE_SIZE=10)
+class WorkerPoolTestCase(TestCase):
+    def setUp(self) -> None:
+        self.pool = threaded.WorkerPool()
+        self.addCleanup(self.pool.shutdown)
+
+    def test_submitted_functions_run_in_background_threads(self):
+        thread_names = []
+
+        for _ in range(5):
+            self.pool.submit(lambda: thread_names.append(threading.current_thread().name))
+        self.pool.join()
+
+        self.assertEqual(len(thread_names), 5)
+        self.assertTrue(all(name.startswith("django-datawatch-") for name in thread_names))
+
+    def test_failing_function_does_not_stop_worker(self):
+        calls = []
+
+        with self.assertLogs("django_datawatch.backends.threaded", level="ERROR"):
+            self.pool.submit(lambda: 1 / 0)
+            self.pool.submit(calls.append, 1)
+            self.pool.join()
+
+        self.assertEqual(calls, [1])
+
+    def test_shutdown_drains_queue(self):
+        release = threading.Event()
+        calls = []
+        self.pool.submit(release.wait)
+        for i in range(5):
+            self.pool.submit(calls.append, i)
+
+        release.set()
+        self.pool.shutdown()
+
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertEqual(self.pool.threads, [])
+
+    @override_settings(DJANGO_DATAWATCH_THREADS=1, DJANGO_DATAWATCH_QUEUE_SIZE=1)
+    def test_full_queue_runs_function_in_submitting_thread(self):
+        started, release = threading.Event(), threading.Event()
+        thread_names = []
+        self.pool.submit(lambda: started.set() or release.wait())
+        started.wait()
+        self.pool.submit(thread_names.append, "queued")
+
+        with self.assertLogs("django_datawatch.backends.threaded", level="WARNING"):
+            self.pool.submit(lambda: thread_names.append(threading.current_thread().name))
+
+        self.assertEqual(thread_names, [threading.current_thread().name])
+        release.set()
+        self.pool.join()
+        self.assertEqual(thread_names, [threading.current_thread().name, "queued"])
+
+
+@mock.patch("django_datawatch.backends.threaded.worker_pool")
+class ThreadedBackendTestCase(TestCase):
+    def setUp(self) -> None:
+        self.backend = threaded.Backend()
+        self.slug = CheckUserIsActive().slug
+        self.user = User.objects.create_user(**{User.USERNAME_FIELD: "user"})
+
+    def test_async_run_is_submitted_to_worker_pool(self, mock_worker_pool):
+        self.backend.run(slug=self.slug, identifier=self.user.pk, run_async=True)
+
+        mock_worker_pool.submit.assert_called_once()
+        self.assertEqual(
+            mock_worker_pool.submit.call_args.kwargs,
+            {"slug": self.slug, "identifier": self.user.pk, "user_forced_refresh": False, "run_id": None},
+        )
+        self.assertFalse(Result.objects.filter(slug=self.slug).exists())
+
+        func = mock_worker_pool.submit.call_args.args[0]
+        func(**mock_worker_pool.submit.call_args.kwargs)
+        self.assertTrue(Result.objects.filter(slug=self.slug, identifier=self.user.pk).exists())
+
+    def test_sync_run_is_executed_right_away(self, mock_worker_pool):
+        self.backend.run(slug=self.slug, identifier=self.user.pk, run_async=False)
+
+        mock_worker_pool.submit.assert_not_called()
+        self.assertTrue(Result.objects.filter(slug=self.slug, identifier=self.user.pk).exists())
+
+    def test_async_run_batch_is_submitted_to_worker_pool(self, mock_worker_pool):
+        self.backend.run_batch(slug=self.slug, identifiers=iter([self.user.pk]))
+
+        self.assertEqual(
+            mock_worker_pool.submit.call_args.kwargs,
+            {"slug": self.slug, "identifiers": [self.user.pk], "run_id": None},
+        )
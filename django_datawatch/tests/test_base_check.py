@@ -1,11 +1,28 @@
-from unittest import mock
+import threading
+from decimal import Decimal
+from unittest import mock, skipUnless
 
+from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.test.testcases import TestCase
+from django.db import connection, connections, transaction
+from django.test.testcases import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from django_datawatch.base import BaseCheck
-from django_datawatch.models import Result, ResultStatusHistory
+from django_datawatch.base import (
+    BaseCheck,
+    BaseCheckForm,
+    CheckResponse,
+    DatawatchCheckSkipError,
+    StatusHistoryWriter,
+)
+from django_datawatch.models import (
+    Result,
+    ResultAssignedGroup,
+    ResultAssignedUser,
+    ResultStatusCount,
+    ResultStatusHistory,
+)
 
 User = get_user_model()
 
@@ -106,3 +123,408 @@ class BaseCheckTestCase(TestCase):
         self.assertEqual(Result.objects.count(), 1)
         self.assertEqual(result.assigned_users.count(), 1)
         self.assertEqual(result.assigned_users.first(), user)
+
+
+class StatusPayload:
+    def __init__(self, pk, status):
+        self.pk = pk
+        self.status = status
+
+    def __str__(self):
+        return f"Payload {self.pk}"
+
+
+class StatusCheck(BaseCheck):
+    def check(self, payload):
+        if payload.status is None:
+            raise DatawatchCheckSkipError
+        response = CheckResponse()
+        response.set_status(payload.status)
+        return response
+
+
+class HandleManyTestCase(TestCase):
+    def setUp(self) -> None:
+        self.check = StatusCheck()
+
+    def _make_payloads(self, statuses):
+        return [StatusPayload(pk, status) for pk, status in enumerate(statuses)]
+
+    def test_handle_many_creates_results_and_history(self):
+        results = self.check.handle_many(self._make_payloads([Result.STATUS.ok, Result.STATUS.critical]))
+
+        self.assertEqual(Result.objects.filter(slug=self.check.slug).count(), 2)
+        self.assertEqual([result.status for result in results], [Result.STATUS.ok, Result.STATUS.critical])
+        self.assertEqual(ResultStatusHistory.objects.filter(from_status=None).count(), 2)
+
+    @override_settings(DJANGO_DATAWATCH_STATUS_COUNTS=True)
+    def test_handle_many_uses_constant_amount_of_queries(self):
+        # create the status counts up front
+        self.check.handle_many(self._make_payloads([Result.STATUS.critical]))
+        self.check.handle_many(self._make_payloads([Result.STATUS.ok] * 5))
+        with CaptureQueriesContext(connection) as small_batch:
+            self.check.handle_many(self._make_payloads([Result.STATUS.critical] * 10))
+
+        self.check.handle_many(self._make_payloads([Result.STATUS.ok] * 50))
+        with CaptureQueriesContext(connection) as large_batch:
+            self.check.handle_many(self._make_payloads([Result.STATUS.critical] * 100))
+
+        self.assertEqual(len(small_batch), len(large_batch))
+
+    @override_settings(DJANGO_DATAWATCH_STATUS_COUNTS=True)
+    def test_handle_many_maintains_status_counts(self):
+        def assert_counts():
+            counts = {
+                (count.slug, count.status): count.amount for count in ResultStatusCount.objects.filter(amount__gt=0)
+            }
+            self.assertEqual(counts, dict(Result.objects.get_status_counts()))
+
+        self.check.handle_many(self._make_payloads([Result.STATUS.ok, Result.STATUS.critical, Result.STATUS.warning]))
+        assert_counts()
+
+        user = User.objects.create_user(**{User.USERNAME_FIELD: "test_user"})
+        Result.objects.get(slug=self.check.slug, identifier="1").acknowledge(user=user, days=1)
+        assert_counts()
+
+        self.check.handle_many(self._make_payloads([Result.STATUS.warning, Result.STATUS.critical, Result.STATUS.ok]))
+        assert_counts()
+
+        self.check.handle_many(self._make_payloads([None, Result.STATUS.ok, Result.STATUS.ok, Result.STATUS.unknown]))
+        assert_counts()
+
+        Result.objects.get(slug=self.check.slug, identifier="3").delete()
+        assert_counts()
+
+    def test_handle_many_unacknowledges_recovered_results(self):
+        self.check.handle_many(self._make_payloads([Result.STATUS.critical]))
+        user = User.objects.create_user(**{User.USERNAME_FIELD: "test_user"})
+        Result.objects.get(slug=self.check.slug).acknowledge(user=user, days=1)
+
+        self.check.handle_many(self._make_payloads([Result.STATUS.ok]))
+
+        result = Result.objects.get(slug=self.check.slug)
+        self.assertIsNone(result.acknowledged_by)
+        self.assertIsNone(result.acknowledged_until)
+        history = result.status_history.latest("created")
+        self.assertEqual(history.from_status, Result.STATUS.critical)
+        self.assertEqual(history.to_status, Result.STATUS.ok)
+
+    def test_handle_many_keeps_concurrent_acknowledgements(self):
+        self.check.handle_many(self._make_payloads([Result.STATUS.critical, Result.STATUS.critical]))
+        user = User.objects.create_user(**{User.USERNAME_FIELD: "test_user"})
+
+        with self.check.preload_results(["0", "1"]):
+            # acknowledged by a user after the results of the chunk have been loaded
+            Result.objects.get(slug=self.check.slug, identifier="0").acknowledge(user=user, days=1)
+            self.check.handle_many(self._make_payloads([Result.STATUS.warning, Result.STATUS.ok]))
+
+        self.assertEqual(Result.objects.get(slug=self.check.slug, identifier="0").acknowledged_by, user)
+        self.assertIsNone(Result.objects.get(slug=self.check.slug, identifier="1").acknowledged_by)
+
+    def test_handle_many_deletes_skipped_results(self):
+        self.check.handle_many(self._make_payloads([Result.STATUS.ok, Result.STATUS.ok]))
+
+        self.check.handle_many(self._make_payloads([None, Result.STATUS.warning]))
+
+        self.assertEqual(list(Result.objects.values_list("identifier", "status")), [("1", Result.STATUS.warning)])
+
+    def test_handle_many_reads_results_once(self):
+        class ConfigForm(BaseCheckForm):
+            threshold = forms.IntegerField(initial=1)
+
+        class ConfiguredStatusCheck(StatusCheck):
+            config_form = ConfigForm
+
+            def check(self, payload):
+                self.get_config(payload)
+                return super().check(payload)
+
+        check = ConfiguredStatusCheck()
+        check.handle_many(self._make_payloads([Result.STATUS.ok] * 5))
+        Result.objects.filter(identifier="0").update(config={"threshold": 5})
+
+        with CaptureQueriesContext(connection) as queries:
+            check.handle_many(self._make_payloads([Result.STATUS.ok] * 10))
+
+        result_selects = [
+            query
+            for query in queries
+            if query["sql"].startswith(f"SELECT {connection.ops.quote_name(Result._meta.db_table)}")
+        ]
+        self.assertEqual(len(result_selects), 1)
+        with check.preload_results(["0", "1"]):
+            self.assertEqual(check.get_config(self._make_payloads([None])[0]), {"threshold": 5})
+            self.assertEqual(check.get_config(self._make_payloads([None, None])[1]), {"threshold": 1})
+
+    def test_handle_many_skips_unchanged_results(self):
+        self.check.handle_many(self._make_payloads([Result.STATUS.ok, Result.STATUS.ok]))
+        before = {result.identifier: result for result in Result.objects.all()}
+
+        results = self.check.handle_many(self._make_payloads([Result.STATUS.ok, Result.STATUS.warning]))
+
+        after = {result.identifier: result for result in Result.objects.all()}
+        self.assertEqual(after["0"].modified, before["0"].modified)
+        self.assertGreater(after["0"].last_checked, before["0"].last_checked)
+        self.assertGreater(after["1"].modified, before["1"].modified)
+        self.assertEqual(after["1"].last_checked, after["1"].modified)
+        self.assertEqual([result.pk for result in results], [after["0"].pk, after["1"].pk])
+
+    def test_is_unchanged_compares_serialized_data(self):
+        result = self.check.save(StatusPayload(0, None), Result.STATUS.ok, data={"balance": Decimal("1.50")})
+        result.refresh_from_db()
+
+        self.assertTrue(result.is_unchanged(Result.STATUS.ok, {"balance": Decimal("1.50")}, result.payload_description))
+        self.assertFalse(result.is_unchanged(Result.STATUS.ok, {"balance": Decimal("2")}, result.payload_description))
+        self.assertFalse(result.is_unchanged(Result.STATUS.warning, result.data, result.payload_description))
+
+    def test_handle_many_only_writes_changed_assignments(self):
+        groups = [Group.objects.create(name=f"group_{i}") for i in range(2)]
+        self.check.get_assigned_groups = mock.Mock(return_value=groups)
+        results = self.check.handle_many(self._make_payloads([Result.STATUS.ok] * 3))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.check.handle_many(self._make_payloads([Result.STATUS.critical] * 3))
+        table_names = (ResultAssignedGroup._meta.db_table, ResultAssignedUser._meta.db_table)
+        writes = [
+            query["sql"]
+            for query in queries
+            if not query["sql"].startswith("SELECT") and any(table in query["sql"] for table in table_names)
+        ]
+        self.assertEqual(writes, [])
+
+        self.check.get_assigned_groups = mock.Mock(return_value=groups[1:])
+        self.check.handle_many(self._make_payloads([Result.STATUS.critical] * 3))
+        for result in results:
+            self.assertEqual(list(result.assigned_groups.all()), groups[1:])
+
+    def test_default_config_is_built_once_per_check_class(self):
+        class ConfigForm(BaseCheckForm):
+            critical = forms.IntegerField(initial=0)
+            warning = forms.IntegerField(initial=100)
+
+        check_class = type("ConfiguredCheck", (StatusCheck,), {"config_form": mock.Mock(wraps=ConfigForm)})
+        check = check_class()
+        check.save(StatusPayload(0, None), Result.STATUS.ok)
+        Result.objects.filter(identifier="0").update(config={"warning": 50})
+
+        self.assertEqual(check.get_config(StatusPayload(0, None)), {"critical": 0, "warning": 50})
+        self.assertEqual(check.get_config(StatusPayload(1, None)), {"critical": 0, "warning": 100})
+        self.assertEqual(check_class().get_config(StatusPayload(1, None)), {"critical": 0, "warning": 100})
+        check_class.config_form.assert_called_once_with()
+
+    def test_default_config_is_not_changed_by_checks(self):
+        class ConfigForm(BaseCheckForm):
+            thresholds = forms.JSONField(initial={"warning": 100})
+
+        check = type("ConfiguredCheck", (StatusCheck,), {"config_form": ConfigForm})()
+
+        check.get_config(StatusPayload(0, None))["thresholds"]["warning"] = 50
+
+        self.assertEqual(check.get_config(StatusPayload(1, None)), {"thresholds": {"warning": 100}})
+
+
+class StatusHistoryWriterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.check = StatusCheck()
+
+    def test_flush_writes_buffered_transitions_at_once(self):
+        results = self.check.handle_many([StatusPayload(pk, Result.STATUS.ok) for pk in range(3)])
+        history = StatusHistoryWriter()
+        for result in results:
+            history.add(result, Result.STATUS.ok, Result.STATUS.critical)
+        history.add(results[0], Result.STATUS.ok, Result.STATUS.ok)
+        self.assertEqual(len(history), 3)
+
+        with self.assertNumQueries(1):
+            history.flush()
+
+        self.assertEqual(ResultStatusHistory.objects.filter(to_status=Result.STATUS.critical).count(), 3)
+        self.assertEqual(len(history), 0)
+
+    def test_resolves_primary_keys_on_flush(self):
+        result = Result(slug=self.check.slug, identifier="0", status=Result.STATUS.ok)
+        history = StatusHistoryWriter()
+        history.add(result, None, Result.STATUS.ok)
+        result.save()
+
+        history.flush()
+
+        self.assertEqual(result.status_history.get().to_status, Result.STATUS.ok)
+
+    def test_history_is_rolled_back_with_results(self):
+        class FailingStatusCheck(StatusCheck):
+            def _save_assignments(self, *args, **kwargs):
+                raise RuntimeError
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            FailingStatusCheck().handle_many([StatusPayload(0, Result.STATUS.critical)])
+
+        self.assertFalse(Result.objects.exists())
+        self.assertFalse(ResultStatusHistory.objects.exists())
+
+
+@skipUnless(connection.vendor == "postgresql", "upserts are only supported on PostgreSQL")
+class UpsertTestCase(TestCase):
+    def setUp(self) -> None:
+        self.check = StatusCheck()
+
+    def test_upsert_returns_previous_status(self):
+        self.check.save(StatusPayload(0, None), Result.STATUS.ok)
+
+        results = Result.objects.upsert(
+            [
+                Result(slug=self.check.slug, identifier="0", status=Result.STATUS.critical),
+                Result(slug=self.check.slug, identifier="1", status=Result.STATUS.warning),
+            ],
+        )
+
+        self.assertEqual(
+            [(result.identifier, result.previous_status, result.status) for result in results],
+            [("0", Result.STATUS.ok, Result.STATUS.critical), ("1", None, Result.STATUS.warning)],
+        )
+        self.assertEqual(Result.objects.count(), 2)
+
+    def test_upsert_keeps_config_of_existing_results(self):
+        result = self.check.save(StatusPayload(0, None), Result.STATUS.ok)
+        Result.objects.filter(pk=result.pk).update(config={"warning": 50})
+
+        (upserted,) = Result.objects.upsert([Result(slug=self.check.slug, identifier="0", status=Result.STATUS.ok)])
+
+        self.assertEqual(upserted.pk, result.pk)
+        self.assertEqual(upserted.config, {"warning": 50})
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    def test_upsert_in_chunks(self):
+        results = [Result(slug=self.check.slug, identifier=str(i), status=Result.STATUS.ok) for i in range(5)]
+
+        with CaptureQueriesContext(connection) as queries:
+            saved = Result.objects.upsert(results)
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(sorted(result.identifier for result in saved), [str(i) for i in range(5)])
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=10_000)
+    def test_upsert_chunks_stay_below_bind_parameter_limit(self):
+        results = [Result(slug=self.check.slug, identifier=str(i), status=Result.STATUS.ok) for i in range(5)]
+        max_bind_parameters = 2 * (len(Result._meta.concrete_fields) + 1)
+
+        with (
+            mock.patch("django_datawatch.querysets.MAX_BIND_PARAMETERS", max_bind_parameters),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            Result.objects.upsert(results)
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(Result.objects.count(), 5)
+
+    def test_save_does_not_read_results_up_front(self):
+        self.check.save(StatusPayload(0, None), Result.STATUS.ok)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self.check.save(StatusPayload(0, None), Result.STATUS.critical)
+
+        result_reads = [query for query in queries if query["sql"].startswith('SELECT "django_datawatch_result".')]
+        self.assertEqual(result_reads, [])
+        history = result.status_history.latest("created")
+        self.assertEqual((history.from_status, history.to_status), (Result.STATUS.ok, Result.STATUS.critical))
+
+
+@skipUnless(connection.vendor == "postgresql", "concurrent writers are only isolated by row locks on PostgreSQL")
+@override_settings(DJANGO_DATAWATCH_STATUS_COUNTS=True)
+class ConcurrentStatusCountTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.check = StatusCheck()
+
+    def _run_concurrently(self, func):
+        """
+        Runs func within a transaction and again in another thread before the transaction is committed
+        """
+        errors = []
+
+        def run():
+            try:
+                func()
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            func()
+            thread = threading.Thread(target=run)
+            thread.start()
+            # the other writer waits for the rows locked by the transaction
+            thread.join(timeout=0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+        self.assertEqual(errors, [])
+
+    def _get_counts(self):
+        return {(count.slug, count.status): count.amount for count in ResultStatusCount.objects.exclude(amount=0)}
+
+    def test_concurrent_creates(self):
+        self._run_concurrently(lambda: self.check.handle_many([StatusPayload(0, Result.STATUS.critical)]))
+
+        self.assertEqual(Result.objects.count(), 1)
+        self.assertEqual(self._get_counts(), {(self.check.slug, Result.STATUS.critical): 1})
+
+    def test_concurrent_deletes(self):
+        self.check.handle_many([StatusPayload(0, Result.STATUS.ok), StatusPayload(1, Result.STATUS.critical)])
+
+        self._run_concurrently(lambda: Result.objects.filter(slug=self.check.slug).delete())
+
+        self.assertFalse(Result.objects.exists())
+        self.assertEqual(self._get_counts(), {})
+
+
+class UserCheck(BaseCheck):
+    model_class = User
+    iterate_chunk_size = 2
+
+    def get_queryset(self):
+        return User.objects.all()
+
+
+class StreamingTestCase(TestCase):
+    def setUp(self) -> None:
+        self.check = UserCheck()
+        self.users = [User.objects.create_user(**{User.USERNAME_FIELD: f"user_{i}"}) for i in range(5)]
+
+    def test_generate_streams_queryset_in_chunks(self):
+        with self.assertNumQueries(3):
+            payloads = list(self.check.generate())
+
+        self.assertEqual(payloads, self.users)
+
+    def test_iterate_with_chunk_size(self):
+        with self.assertNumQueries(2):
+            payloads = list(self.check.iterate(User.objects.filter(pk__gt=self.users[0].pk), chunk_size=3))
+
+        self.assertEqual(payloads, self.users[1:])
+
+    def test_generate_identifiers_only_queries_primary_keys(self):
+        with CaptureQueriesContext(connection) as queries:
+            identifiers = list(self.check.generate_identifiers())
+
+        self.assertEqual(identifiers, [user.pk for user in self.users])
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn("username", queries[0]["sql"])
+
+    def test_generate_identifiers_with_custom_identifier(self):
+        check = type("UsernameCheck", (UserCheck,), {"get_identifier": lambda self, payload: payload.username})()
+
+        self.assertEqual(list(check.generate_identifiers()), [user.username for user in self.users])
+
+    def test_generate_identifiers_with_custom_generate(self):
+        def generate(self, shard=None, since=None):
+            yield from User.objects.filter(is_active=True).order_by("pk")
+
+        self.users[0].is_active = False
+        self.users[0].save()
+        check = type("ActiveUserCheck", (UserCheck,), {"generate": generate})()
+
+        self.assertEqual(list(check.generate_identifiers()), [user.pk for user in self.users[1:]])
+
+    def test_generate_without_queryset(self):
+        with self.assertRaises(NotImplementedError):
+            list(BaseCheck().generate())
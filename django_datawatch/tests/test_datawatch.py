@@ -0,0 +1,251 @@
+from typing import ClassVar
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.db.models import Model, signals
+from django.test.testcases import TestCase, override_settings
+
+from django_datawatch.base import BaseCheck
+from django_datawatch.datawatch import DatawatchHandler, datawatch
+from django_datawatch.models import Result
+
+
+@datawatch.register
+class CheckSharedInstance(BaseCheck):
+    def check(self, payload):
+        return payload
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+@datawatch.register
+class CheckOwnInstance(BaseCheck):
+    cache_instance = False
+
+    def check(self, payload):
+        return payload
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+class CheckInstanceTestCase(TestCase):
+    def test_check_instance_is_shared(self):
+        slug = CheckSharedInstance().slug
+
+        check = datawatch.get_check_instance(slug)
+
+        self.assertIsInstance(check, CheckSharedInstance)
+        self.assertIs(datawatch.get_check_instance(slug), check)
+        self.assertIs(datawatch.get_check_instance_for_class(CheckSharedInstance), check)
+        self.assertIs(Result(slug=slug).get_check_instance(), check)
+
+    def test_check_instance_opt_out(self):
+        slug = CheckOwnInstance().slug
+
+        self.assertIsInstance(datawatch.get_check_instance(slug), CheckOwnInstance)
+        self.assertIsNot(datawatch.get_check_instance(slug), datawatch.get_check_instance(slug))
+
+    def test_unknown_slug(self):
+        self.assertIsNone(datawatch.get_check_instance("unknown.Check"))
+
+
+class CheckGroupTrigger(BaseCheck):
+    trigger_update: ClassVar[dict[str, Model]] = {"group": Group}
+
+    def check(self, payload):
+        return payload
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+    def get_group_payload(self, instance):
+        return instance
+
+
+class TriggerDispatchTestCase(TestCase):
+    def setUp(self) -> None:
+        self.handler = DatawatchHandler()
+        self.check_classes = [type(f"CheckGroupTrigger{i}", (CheckGroupTrigger,), {}) for i in range(3)]
+        for check_class in self.check_classes:
+            self.handler.register(check_class)
+
+    def test_single_receiver_per_trigger_model(self):
+        receivers = [
+            lookup_key
+            for lookup_key, *_ in signals.post_save.receivers
+            if lookup_key[0] == "django_datawatch_auth.Group"
+        ]
+
+        self.assertEqual(len(receivers), 1)
+
+    def test_update_related_resolves_every_check_once(self):
+        group = Group(pk=1, name="group")
+
+        with (
+            mock.patch.object(CheckGroupTrigger, "get_group_payload", autospec=True) as mock_get_payload,
+            mock.patch.object(self.handler, "schedule_run") as mock_schedule_run,
+        ):
+            mock_get_payload.side_effect = lambda check, instance: instance
+            self.handler.update_related(sender=Group, instance=group)
+
+        self.assertEqual(mock_get_payload.call_count, len(self.check_classes))
+        self.assertEqual(
+            [call.args[0].slug for call in mock_schedule_run.call_args_list],
+            [check_class().slug for check_class in self.check_classes],
+        )
+
+    def test_register_again_replaces_dispatch_entry(self):
+        self.handler.register(self.check_classes[0])
+
+        with mock.patch.object(self.handler, "schedule_run") as mock_schedule_run:
+            self.handler.update_related(sender=Group, instance=Group(pk=1, name="group"))
+
+        self.assertEqual(mock_schedule_run.call_count, len(self.check_classes))
+
+    def test_get_checks_for_related_model(self):
+        self.assertEqual(self.handler.get_checks_for_related_model(Group), self.check_classes)
+        self.assertIsNone(self.handler.get_checks_for_related_model(Result))
+
+        # a check registered again without the trigger is not related anymore
+        name, module = self.check_classes[0].__name__, self.check_classes[0].__module__
+        self.handler.register(type(name, (CheckGroupTrigger,), {"__module__": module, "trigger_update": None}))
+
+        self.assertEqual(self.handler.get_checks_for_related_model(Group), self.check_classes[1:])
+
+
+class CheckGroupNameTrigger(CheckGroupTrigger):
+    trigger_update_fields: ClassVar[dict[str, list[str]]] = {"group": ["name"]}
+
+
+class TriggerFieldsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.handler = DatawatchHandler()
+        self.handler.register(CheckGroupTrigger)
+        self.handler.register(CheckGroupNameTrigger)
+        self.group = Group.objects.create(name="group")
+
+    def get_triggered_slugs(self, instance, **kwargs):
+        with mock.patch.object(self.handler, "schedule_run") as mock_schedule_run:
+            self.handler.update_related(sender=Group, instance=instance, **kwargs)
+        return {call.args[0].slug for call in mock_schedule_run.call_args_list}
+
+    def test_skips_check_if_update_fields_are_irrelevant(self):
+        slugs = self.get_triggered_slugs(self.group, update_fields=frozenset(["id"]))
+
+        self.assertEqual(slugs, {CheckGroupTrigger().slug})
+
+    def test_runs_check_if_update_fields_are_relevant(self):
+        slugs = self.get_triggered_slugs(self.group, update_fields=frozenset(["name"]))
+
+        self.assertEqual(slugs, {CheckGroupTrigger().slug, CheckGroupNameTrigger().slug})
+
+    def test_runs_check_if_changed_fields_are_unknown(self):
+        slugs = self.get_triggered_slugs(self.group)
+
+        self.assertEqual(slugs, {CheckGroupTrigger().slug, CheckGroupNameTrigger().slug})
+
+    @override_settings(DJANGO_DATAWATCH_TRACK_CHANGED_FIELDS=True)
+    def test_tracks_changed_fields(self):
+        group = Group.objects.get(pk=self.group.pk)
+        self.handler.track_fields(Group, group)
+
+        self.assertEqual(self.get_triggered_slugs(group), {CheckGroupTrigger().slug})
+
+        group.name = "renamed"
+        self.assertEqual(self.get_triggered_slugs(group), {CheckGroupTrigger().slug, CheckGroupNameTrigger().slug})
+
+        # the saved values are tracked after the update
+        self.assertEqual(self.get_triggered_slugs(group), {CheckGroupTrigger().slug})
+
+    @override_settings(DJANGO_DATAWATCH_TRACK_CHANGED_FIELDS=True)
+    def test_runs_check_for_created_instance(self):
+        group = Group(name="new")
+        self.handler.track_fields(Group, group)
+
+        slugs = self.get_triggered_slugs(group, created=True)
+
+        self.assertEqual(slugs, {CheckGroupTrigger().slug, CheckGroupNameTrigger().slug})
+
+    @override_settings(DJANGO_DATAWATCH_TRACK_CHANGED_FIELDS=True)
+    def test_deferred_fields_are_considered_changed(self):
+        group = Group.objects.only("pk").get(pk=self.group.pk)
+        self.handler.track_fields(Group, group)
+
+        slugs = self.get_triggered_slugs(group)
+
+        self.assertEqual(slugs, {CheckGroupTrigger().slug, CheckGroupNameTrigger().slug})
+
+
+class CheckResultConfigTrigger(BaseCheck):
+    trigger_update: ClassVar[dict[str, Model]] = {"result": Result}
+    trigger_update_fields: ClassVar[dict[str, list[str]]] = {"result": ["config"]}
+
+    def get_result_payload(self, instance):
+        return instance
+
+
+class TrackMutableFieldsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.handler = DatawatchHandler()
+        self.handler.register(CheckResultConfigTrigger)
+
+    @override_settings(DJANGO_DATAWATCH_TRACK_CHANGED_FIELDS=True)
+    def test_tracks_values_changed_in_place(self):
+        result = Result.objects.create(slug="result", identifier="1", config={"threshold": 1})
+        self.handler.track_fields(Result, result)
+
+        result.config["threshold"] = 2
+
+        self.assertEqual(self.handler.get_changed_fields(Result, result), {"config"})
+
+
+class CheckGroupModel(BaseCheck):
+    model_class = Group
+
+    def check(self, payload):
+        return payload
+
+    def get_identifier(self, payload):
+        return payload.pk
+
+
+class ModelIndexTestCase(TestCase):
+    def setUp(self) -> None:
+        self.handler = DatawatchHandler()
+        self.check_classes = [type(f"CheckGroupModel{i}", (CheckGroupModel,), {}) for i in range(3)]
+        for check_class in self.check_classes:
+            self.handler.register(check_class)
+
+    def test_get_checks_for_model(self):
+        self.assertEqual(self.handler.get_checks_for_model(Group), self.check_classes)
+        self.assertEqual(self.handler.get_checks_for_model(Result), [])
+
+    def test_single_delete_receiver_per_model(self):
+        receivers = [
+            lookup_key
+            for lookup_key, *_ in signals.post_delete.receivers
+            if lookup_key[0] == "django_datawatch_auth.Group"
+        ]
+
+        self.assertEqual(len(receivers), 1)
+
+    def test_register_again_updates_index(self):
+        name, module = self.check_classes[0].__name__, self.check_classes[0].__module__
+        check_class = type(name, (CheckGroupModel,), {"__module__": module, "model_class": Result})
+
+        self.handler.register(check_class)
+
+        self.assertEqual(self.handler.get_checks_for_model(Group), self.check_classes[1:])
+        self.assertEqual(self.handler.get_checks_for_model(Result), [check_class])
+
+    def test_register_again_removes_trigger(self):
+        check_class = self.check_classes[0]
+        self.handler.register(type(check_class.__name__, (CheckGroupTrigger,), {"__module__": check_class.__module__}))
+        self.handler.register(check_class)
+
+        with mock.patch.object(self.handler, "schedule_run") as mock_schedule_run:
+            self.handler.update_related(sender=Group, instance=Group(pk=1, name="group"))
+
+        mock_schedule_run.assert_not_called()
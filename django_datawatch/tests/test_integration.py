@@ -21,9 +21,13 @@ def test_generator(check_instance):
         if "get_identifier" not in check_dict:
             self.fail(f"{check_instance.slug} must implement the get_identifier method")
 
-        # generate must be implemented if task should be running periodically
-        if check_dict.get("run_every", None) is not None and "generate" not in check_dict:
-            self.fail(f"{check_instance.slug} must implement the generate method")
+        # generate or get_queryset must be implemented if task should be running periodically
+        if (
+            check_dict.get("run_every", None) is not None
+            and "generate" not in check_dict
+            and "get_queryset" not in check_dict
+        ):
+            self.fail(f"{check_instance.slug} must implement the generate or get_queryset method")
 
         # a resolver method must be implemented for every update trigger
         if check_dict.get("trigger_update", None) is not None:
@@ -1,6 +1,8 @@
 from unittest import mock
 
+from django.db import connection, transaction
 from django.test.testcases import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from django_datawatch.base import BaseCheck
 from django_datawatch.datawatch import datawatch, delete_results
@@ -45,6 +47,60 @@ class PostDeleteTestCase(TestCase):
             mock_manager.filter.return_value = manager_filtered
 
             # test if delete has been called
-            datawatch.delete_results(sender=Result, instance=Result(pk=1))
-            mock_manager.filter.assert_called_with(slug=CheckPostDelete().slug, identifier=1)
+            with self.captureOnCommitCallbacks(execute=True):
+                datawatch.delete_results(sender=Result, instance=Result(pk=1))
+            mock_manager.filter.assert_called_with(slug=CheckPostDelete().slug, identifier__in=["1"])
             manager_filtered.delete.assert_called_with()
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_checks_for_model")
+    def test_delete_results_in_chunks_on_commit(self, mock_get_checks_for_model):
+        mock_get_checks_for_model.return_value = [CheckPostDelete]
+        slug = CheckPostDelete().slug
+        Result.objects.bulk_create([Result(slug=slug, identifier=str(i)) for i in range(5)])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            for identifier in [0, 1, 2, 3, 3]:
+                datawatch.delete_results(sender=Result, instance=Result(pk=identifier))
+        self.assertEqual(Result.objects.filter(slug=slug).count(), 5)
+
+        self.assertEqual(len(callbacks), 1)
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+
+        table = connection.ops.quote_name(Result._meta.db_table)
+        deletes = [query["sql"].split(" WHERE ")[0] for query in queries if query["sql"].startswith("DELETE")]
+        self.assertEqual(len([delete for delete in deletes if delete.endswith(table)]), 2)
+        self.assertEqual(list(Result.objects.filter(slug=slug).values_list("identifier", flat=True)), ["4"])
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_checks_for_model")
+    def test_delete_results_discarded_with_transaction(self, mock_get_checks_for_model):
+        mock_get_checks_for_model.return_value = [CheckPostDelete]
+        Result.objects.create(slug=CheckPostDelete().slug, identifier="1")
+
+        with (
+            self.captureOnCommitCallbacks(execute=True) as callbacks,
+            self.assertRaises(RuntimeError),
+            transaction.atomic(),
+        ):
+            datawatch.delete_results(sender=Result, instance=Result(pk=1))
+            raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertTrue(Result.objects.filter(slug=CheckPostDelete().slug, identifier="1").exists())
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_checks_for_model")
+    def test_delete_results_discarded_with_savepoint(self, mock_get_checks_for_model):
+        mock_get_checks_for_model.return_value = [CheckPostDelete]
+        slug = CheckPostDelete().slug
+        Result.objects.bulk_create([Result(slug=slug, identifier=str(i)) for i in range(10, 13)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            datawatch.delete_results(sender=Result, instance=Result(pk=10))
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                datawatch.delete_results(sender=Result, instance=Result(pk=11))
+                raise RuntimeError
+            with transaction.atomic():
+                datawatch.delete_results(sender=Result, instance=Result(pk=12))
+
+        self.assertEqual(list(Result.objects.filter(slug=slug).values_list("identifier", flat=True)), ["11"])
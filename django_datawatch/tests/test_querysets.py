@@ -1,8 +1,12 @@
+import io
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.test.testcases import TestCase
+from django.core.management import call_command
+from django.test.testcases import TestCase, override_settings
 
-from django_datawatch.models import Result
+from django_datawatch.forms import ResultFilterForm
+from django_datawatch.models import Result, ResultStatusCount
 
 User = get_user_model()
 
@@ -111,6 +115,17 @@ class ResultQuerySetTestCase(TestCase):
             ],
         )
 
+    def test_for_user_does_not_multiply_results(self) -> None:
+        groups = self._make_groups(["g1", "g2"])
+        user = self._make_users(["u1"])[0]
+        user.groups.set(groups)
+        result = self._make_result("test", groups=groups)
+
+        queryset = Result.objects.for_user(user)
+
+        self.assertFalse(queryset.query.distinct)
+        self.assertEqual(list(queryset), [result])
+
     def test_get_stats_overcounts_due_to_join_multiplication(self) -> None:
         users = self._make_users(["u1", "u2"])
         groups = self._make_groups(["g1", "g2"])
@@ -126,3 +141,91 @@ class ResultQuerySetTestCase(TestCase):
 
         self.assertEqual(stats.count(), 1)
         self.assertEqual(stats[0]["amount"], 1)
+
+
+@override_settings(DJANGO_DATAWATCH_STATUS_COUNTS=True)
+class ResultStatusCountTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create(**{User.USERNAME_FIELD: "user"})
+        for identifier, status in enumerate([Result.STATUS.ok, Result.STATUS.warning, Result.STATUS.critical] * 2):
+            Result.objects.create(slug=f"check{identifier % 2}", identifier=str(identifier), status=status)
+
+    def _get_counts(self):
+        return {(count.slug, count.status): count.amount for count in ResultStatusCount.objects.filter(amount__gt=0)}
+
+    def test_save_and_delete(self):
+        self.assertEqual(
+            self._get_counts(),
+            {
+                ("check0", Result.STATUS.ok): 1,
+                ("check0", Result.STATUS.warning): 1,
+                ("check0", Result.STATUS.critical): 1,
+                ("check1", Result.STATUS.ok): 1,
+                ("check1", Result.STATUS.warning): 1,
+                ("check1", Result.STATUS.critical): 1,
+            },
+        )
+
+        Result.objects.filter(slug="check1").delete()
+        result = Result.objects.get(slug="check0", status=Result.STATUS.warning)
+        result.acknowledge(user=self.user, days=1)
+        Result.objects.filter(pk=result.pk).first().delete()
+        result = Result.objects.get(slug="check0", status=Result.STATUS.ok)
+        result.status = Result.STATUS.critical
+        result.save()
+
+        self.assertEqual(self._get_counts(), {("check0", Result.STATUS.critical): 2})
+
+    def test_acknowledge_keeps_counts(self):
+        result = Result.objects.get(identifier="2")
+
+        with self.assertNumQueries(1):
+            result.acknowledge(user=self.user, days=1)
+
+        self.assertEqual(self._get_counts()["check0", Result.STATUS.critical], 1)
+
+    def test_rebuild(self):
+        Result.objects.filter(identifier="2").update(status=Result.STATUS.ok)
+        ResultStatusCount.objects.filter(slug="check1").update(amount=42)
+
+        call_command("datawatch_rebuild_status_counts", stdout=io.StringIO())
+
+        self.assertEqual(self._get_counts(), dict(Result.objects.get_status_counts()))
+        self.assertEqual(self._get_counts()["check0", Result.STATUS.ok], 2)
+
+    @override_settings(DJANGO_DATAWATCH_STATUS_COUNTS=False)
+    def test_disabled(self):
+        ResultStatusCount.objects.all().delete()
+
+        Result.objects.create(slug="check0", identifier="new")
+        Result.objects.all().delete()
+
+        self.assertFalse(ResultStatusCount.objects.exists())
+
+    def test_filter_form_stats(self):
+        ResultStatusCount.objects.filter(slug="check1", status=Result.STATUS.ok).update(amount=42)
+        form = ResultFilterForm(user=self.user, data={"status": ResultFilterForm.STATUS_CHOICES.all})
+
+        with self.assertNumQueries(1):
+            stats = list(form.get_stats(Result.objects.all()))
+
+        self.assertEqual(
+            sorted((row["status"], row["status_name"], row["amount"]) for row in stats),
+            [
+                (Result.STATUS.ok, "OK", 43),
+                (Result.STATUS.warning, "Warning", 2),
+                (Result.STATUS.critical, "Critical", 2),
+            ],
+        )
+
+    def test_filter_form_stats_failed(self):
+        Result.objects.get(identifier="2").acknowledge(user=self.user, days=1)
+        form = ResultFilterForm(user=self.user, data={"status": ResultFilterForm.STATUS_CHOICES.failed})
+        self.assertTrue(form.is_valid())
+
+        stats = form.get_stats(form.filter_queryset(request=None, queryset=Result.objects.all()))
+
+        self.assertEqual(
+            sorted((row["status"], row["amount"]) for row in stats),
+            [(Result.STATUS.warning, 2), (Result.STATUS.critical, 1)],
+        )
@@ -1,8 +1,10 @@
 from typing import ClassVar
 from unittest import mock
 
+from django.contrib.auth.models import Group
+from django.db import transaction
 from django.db.models import Model
-from django.test.testcases import TestCase, override_settings
+from django.test.testcases import TestCase, TransactionTestCase, override_settings
 
 from django_datawatch.backends.base import BaseBackend
 from django_datawatch.base import BaseCheck
@@ -46,7 +48,7 @@ class TriggerUpdateTestCase(TestCase):
     @mock.patch("django_datawatch.datawatch.DatawatchHandler.update_related")
     def test_setting_run_signals_true(self, mock_update):
         run_checks(sender="sender", instance="instance", created=None, raw=None, using=None)
-        mock_update.assert_called_once_with("sender", "instance", None)
+        mock_update.assert_called_once_with("sender", "instance", None, update_fields=None, created=None)
 
     @override_settings(DJANGO_DATAWATCH_RUN_SIGNALS=False)
     @mock.patch("django_datawatch.datawatch.DatawatchHandler.update_related")
@@ -63,31 +65,141 @@ class TriggerUpdateTestCase(TestCase):
         with self.captureOnCommitCallbacks() as callbacks:
             datawatch.update_related(sender=Result, instance=Result(pk=143243, slug="143243"))
 
-        self.assertEqual(3, len(callbacks))
-
-        parameters = [
-            {
-                "slug": "django_datawatch.tests.test_trigger_update.CheckTriggerUpdate",
-                "identifier": 143243,
-                "run_async": True,
-                "queue": None,
-            },
-            {
-                "slug": "django_datawatch.tests.test_trigger_update.CheckTriggerUpdateList",
-                "identifier": 143243,
-                "run_async": True,
-                "queue": "individual_queue",
-            },
-            {
-                "slug": "django_datawatch.tests.test_trigger_update.CheckTriggerUpdateList",
-                "identifier": 51945,
-                "run_async": True,
-                "queue": "individual_queue",
-            },
-        ]
-
-        for callback in callbacks:
-            callback()
-            parameter_list = parameters.pop(0)
-            backend.run.assert_called_once_with(**parameter_list)
-            backend.reset_mock()
+        self.assertEqual(1, len(callbacks))
+        callbacks[0]()
+
+        backend.run.assert_called_once_with(
+            slug="django_datawatch.tests.test_trigger_update.CheckTriggerUpdate",
+            identifier=143243,
+            run_async=True,
+            queue=None,
+        )
+        backend.run_batch.assert_called_once_with(
+            slug="django_datawatch.tests.test_trigger_update.CheckTriggerUpdateList",
+            identifiers=[143243, 51945],
+            run_async=True,
+            queue="individual_queue",
+        )
+
+    @override_settings(DJANGO_DATAWATCH_RUN_SIGNALS=True)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_update_related_coalesces_runs_within_transaction(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend)
+        mock_get_backend.return_value = backend
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for _ in range(3):
+                datawatch.update_related(sender=Result, instance=Result(pk=143243, slug="143243"))
+
+        self.assertEqual(1, len(callbacks))
+        self.assertEqual(backend.run.call_count, 1)
+        self.assertEqual(backend.run_batch.call_count, 1)
+
+    @override_settings(DJANGO_DATAWATCH_RUN_SIGNALS=True)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_update_related_discards_runs_of_rolled_back_transaction(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend)
+        mock_get_backend.return_value = backend
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                datawatch.update_related(sender=Result, instance=Result(pk=1, slug="1"))
+                raise RuntimeError
+            datawatch.update_related(sender=Result, instance=Result(pk=143243, slug="143243"))
+
+        self.assertEqual(1, len(callbacks))
+        backend.run.assert_called_once_with(
+            slug="django_datawatch.tests.test_trigger_update.CheckTriggerUpdate",
+            identifier=143243,
+            run_async=True,
+            queue=None,
+        )
+
+    @override_settings(DJANGO_DATAWATCH_BATCH_SIZE=2)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_trigger_bulk_dispatches_batches(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend)
+        mock_get_backend.return_value = backend
+        results = Result.objects.bulk_create([Result(slug="bulk", identifier=str(i)) for i in range(3)])
+        pks = sorted(result.pk for result in Result.objects.filter(slug="bulk"))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            datawatch.trigger_bulk(Result, [*pks, pks[0]])
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(1, len(callbacks))
+        backend.run.assert_not_called()
+        self.assertEqual(
+            [
+                (call.kwargs["slug"].rsplit(".", 1)[1], call.kwargs["identifiers"])
+                for call in backend.run_batch.mock_calls
+            ],
+            [
+                ("CheckTriggerUpdate", pks[:2]),
+                ("CheckTriggerUpdate", pks[2:]),
+                ("CheckTriggerUpdateList", [pks[0], 51945]),
+                ("CheckTriggerUpdateList", pks[1:]),
+            ],
+        )
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_trigger_bulk_ignores_untriggered_model(self, mock_get_backend):
+        with self.assertNumQueries(0), self.captureOnCommitCallbacks() as callbacks:
+            datawatch.trigger_bulk(Group, [1, 2])
+
+        self.assertEqual(callbacks, [])
+        mock_get_backend.assert_not_called()
+
+    @override_settings(DJANGO_DATAWATCH_RUN_SIGNALS=True)
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_deferred_triggers_dispatch_once(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend)
+        mock_get_backend.return_value = backend
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, datawatch.deferred_triggers():
+            with datawatch.deferred_triggers():
+                datawatch.update_related(sender=Result, instance=Result(pk=1, slug="1"))
+            datawatch.update_related(sender=Result, instance=Result(pk=1, slug="1"))
+            datawatch.update_related(sender=Result, instance=Result(pk=2, slug="2"))
+            self.assertEqual(callbacks, [])
+
+        self.assertEqual(1, len(callbacks))
+        backend.run.assert_not_called()
+        self.assertEqual(
+            [call.kwargs["identifiers"] for call in backend.run_batch.mock_calls],
+            [[1, 2], [1, 51945, 2]],
+        )
+
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_deferred_triggers_discarded_with_transaction(self, mock_get_backend):
+        with (
+            self.captureOnCommitCallbacks(execute=True) as callbacks,
+            self.assertRaises(RuntimeError),
+            transaction.atomic(),
+            datawatch.deferred_triggers(),
+        ):
+            datawatch.update_related(sender=Result, instance=Result(pk=1, slug="1"))
+            raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        mock_get_backend.assert_not_called()
+
+
+class TriggerUpdateTransactionTestCase(TransactionTestCase):
+    @mock.patch("django_datawatch.datawatch.DatawatchHandler.get_backend")
+    def test_schedule_run_after_rolled_back_transaction(self, mock_get_backend):
+        backend = mock.Mock(spec=BaseBackend)
+        mock_get_backend.return_value = backend
+        check = datawatch.get_check_instance_for_class(CheckTriggerUpdate)
+
+        # the same atomic block is entered twice like the one of a view with ATOMIC_REQUESTS
+        atomic = transaction.atomic()
+        with self.assertRaises(RuntimeError), atomic:
+            datawatch.schedule_run(check, 1)
+            raise RuntimeError
+        with atomic:
+            datawatch.schedule_run(check, 2)
+            datawatch.schedule_run(check, 2)
+            backend.run.assert_not_called()
+
+        backend.run.assert_called_once_with(slug=check.slug, identifier=2, run_async=True, queue=None)
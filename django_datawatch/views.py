@@ -39,7 +39,7 @@ class DashboardView(LoginRequiredMixin, PermissionRequiredMixin, FilteredListVie
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx.update({"check": Result})
+        ctx.update({"check": Result, "stats": list(ctx["form"].get_stats(self.object_list))})
         return ctx
 
 
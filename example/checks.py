@@ -29,7 +29,7 @@ class UserHasEnoughBalance(BaseCheck):
     queue = "datawatch"
 
     def generate(self):
-        yield from models.Wallet.objects.all()
+        yield from self.iterate(models.Wallet.objects.select_related("user"))
 
     def check(self, payload):
         config = self.get_config(payload)